@@ -1,70 +1,465 @@
 """
 这个实现完整展示了工厂方法模式在日志系统中的应用：
 核心结构：
+日志级别（LogLevel）
+DEBUG/INFO/WARN/ERROR/CRITICAL 枚举（WARNING 是 WARN 的别名），级别名不区分大小写，每个日志器可通过 set_level 设置自己的阈值
 抽象产品（Logger）
-定义所有日志记录器的统一接口log，包含日志消息和日志级别参数
+定义所有日志记录器的统一接口log，包含日志消息和日志级别参数；
+log 先按级别过滤，通过后才渲染惰性消息（可调用对象），再交给子类实现的 write 输出；
+%-格式参数通过 debug/info/warn/error 传入，同样只在日志通过过滤后才渲染
+时间戳格式化器（TimestampFormatter）
+日志器可替换的时间戳组件，同一秒内复用已格式化的字符串，可选毫秒后缀
 具体产品
 FileLogger：将日志写入文件，包含文件路径属性和文件写入逻辑
+BufferedFileLogger：带缓冲的文件日志器，持有常驻文件句柄，按条数/时间批量刷盘，后台线程定时刷盘
 ConsoleLogger：在控制台输出日志，包含时间戳格式化逻辑
-DatabaseLogger：模拟数据库日志存储（实际可扩展为真实数据库操作）
+DatabaseLogger：基于 SQLite 的数据库日志器，通过连接池和 executemany 批量插入日志
+AsyncLogger：异步日志器，调用方只负责入队，由后台写线程把日志交给被包装的具体日志器
 抽象工厂（LoggerFactory）
 声明创建日志记录器的接口create_logger，隔离具体创建逻辑
 具体工厂
-FileLoggerFactory：根据文件路径创建文件日志器
+FileLoggerFactory：根据文件路径创建文件日志器（指定 buffer_size 时创建带缓冲的文件日志器）
 ConsoleLoggerFactory：创建控制台日志器
-DatabaseLoggerFactory：创建数据库日志器
+DatabaseLoggerFactory：根据数据库路径、连接池大小和批量大小创建数据库日志器
+AsyncLoggerFactory：包装任意日志工厂，为其创建的日志器加上有界队列和后台写线程
 模式优势：
 解耦对象创建：客户端无需知道具体日志器的创建细节，只需与抽象工厂和抽象日志器交互
 易于扩展：新增日志类型（如 EmailLogger）时，只需添加新的具体产品和具体工厂，无需修改现有代码
 统一管理：通过工厂类集中管理日志器创建，方便添加日志器初始化参数（如文件路径、数据库配置）
 扩展建议：
-可以添加日志级别枚举类（如 DEBUG/INFO/ERROR）提高类型安全性
-在抽象日志器中添加set_level方法实现日志级别过滤
-为数据库日志器添加真实的数据库连接池和 SQL 执行逻辑
 通过配置文件（如 JSON/YAML）动态指定日志类型和参数，实现更灵活的日志系统配置
 """
 from abc import ABC, abstractmethod
+from enum import IntEnum
+import queue
+import sqlite3
+import sys
+import threading
 import time
+import weakref
+
+
+# --------------------- 时间戳格式化器（TimestampFormatter） ---------------------
+class TimestampFormatter:
+    """带缓存的时间戳格式化器
+
+    高频写日志时，同一秒内的 strftime 结果完全相同，因此只在秒数变化时重新格式化，
+    毫秒后缀直接由小数部分拼接，无需再调用 strftime。
+    """
+
+    def __init__(self, fmt: str = "%Y-%m-%d %H:%M:%S", with_millis: bool = False):
+        self.fmt = fmt
+        self.with_millis = with_millis
+        self._cache = (None, "")  # (秒, 格式化结果)，整体替换保证多线程下读到一致的数据
+
+    def format(self, now: float = None) -> str:
+        if now is None:
+            now = time.time()
+        second = int(now)
+        cached_second, text = self._cache
+        if cached_second != second:
+            text = time.strftime(self.fmt, time.localtime(second))
+            self._cache = (second, text)
+        if self.with_millis:
+            return f"{text}.{int((now - second) * 1000):03d}"
+        return text
+
+
+DEFAULT_TIMESTAMP_FORMATTER = TimestampFormatter()
+
+
+# --------------------- 日志级别（LogLevel） ---------------------
+class LogLevel(IntEnum):
+    DEBUG = 10
+    INFO = 20
+    WARN = 30
+    WARNING = 30  # WARN 的别名
+    ERROR = 40
+    CRITICAL = 50
+
+
+def _to_level(level) -> LogLevel:
+    """把级别名（不区分大小写）或数值转换为 LogLevel，无法识别时抛出 ValueError"""
+    if isinstance(level, str):
+        try:
+            return LogLevel[level.upper()]
+        except KeyError:
+            raise ValueError(f"未知的日志级别: {level!r}") from None
+    return LogLevel(level)
+
+
+# --------------------- 定时刷盘（PeriodicFlusher） ---------------------
+class PeriodicFlusher:
+    """后台守护线程，每隔 interval 秒调用一次日志器的 flush，日志器关闭时停止
+
+    只持有 flush 方法的弱引用，日志器被回收后线程自动退出。
+    flush 抛出的异常（磁盘已满、数据库被锁等）不会结束线程，而是计入 failures 并输出到 stderr，下一个周期继续重试。
+    """
+
+    def __init__(self, flush, interval: float):
+        self._flush = weakref.WeakMethod(flush)
+        self._interval = interval
+        self.failures = 0
+        self.last_error = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-flusher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            flush = self._flush()
+            if flush is None:
+                return
+            try:
+                flush()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = e
+                print(f"定时刷盘失败（第 {self.failures} 次）: {e!r}", file=sys.stderr)
+            del flush
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
 
 
 # --------------------- 抽象产品（Logger） ---------------------
 class Logger(ABC):
     """日志记录器抽象类"""
 
+    timestamp_formatter = DEFAULT_TIMESTAMP_FORMATTER
+    level = LogLevel.DEBUG  # 默认不过滤任何日志
+
+    def set_level(self, level) -> None:
+        """设置日志级别阈值，低于该级别的日志直接丢弃"""
+        self.level = _to_level(level)
+
+    def is_enabled_for(self, level) -> bool:
+        return _to_level(level) >= self.level
+
+    def log(self, message, level="INFO") -> None:
+        """记录日志
+
+        级别检查在任何字符串处理之前完成，被过滤的日志几乎没有开销。
+        message 可以是返回字符串的可调用对象，只在日志通过过滤后才调用。
+        """
+        self._log(_to_level(level), message, ())
+
+    def _log(self, level: LogLevel, message, args) -> None:
+        if level < self.level:
+            return
+        if args:
+            message = message % args
+        elif callable(message):
+            message = message()
+        self.write(message, level.name)
+
+    def debug(self, message, *args) -> None:
+        self._log(LogLevel.DEBUG, message, args)
+
+    def info(self, message, *args) -> None:
+        self._log(LogLevel.INFO, message, args)
+
+    def warn(self, message, *args) -> None:
+        self._log(LogLevel.WARN, message, args)
+
+    def error(self, message, *args) -> None:
+        self._log(LogLevel.ERROR, message, args)
+
     @abstractmethod
-    def log(self, message: str, level: str = "INFO") -> None:
-        """记录日志的抽象方法"""
+    def write(self, message: str, level: str) -> None:
+        """输出一条已通过级别过滤、已渲染完成的日志"""
         pass
 
+    def close(self) -> None:
+        """释放日志器持有的资源，默认无需处理"""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
 
 # --------------------- 具体产品（Concrete Loggers） ---------------------
 class FileLogger(Logger):
     """文件日志记录器"""
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, timestamp_formatter: TimestampFormatter = None):
         self.file_path = file_path
+        if timestamp_formatter is not None:
+            self.timestamp_formatter = timestamp_formatter
 
-    def log(self, message: str, level: str = "INFO"):
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    def write(self, message: str, level: str):
+        timestamp = self.timestamp_formatter.format()
         with open(self.file_path, "a") as f:
             f.write(f"[{timestamp}] [{level}] {message}\n")
         print(f"文件日志已记录: {message}")
 
 
+class BufferedFileLogger(Logger):
+    """带缓冲的文件日志记录器
+
+    常驻一个文件句柄，日志先缓存在内存中，满足以下任一条件时批量写入文件：
+    缓冲条数达到 buffer_size、距上次刷盘超过 flush_interval 秒、调用 flush/close。
+    时间条件除了在 log 调用时检查，还由后台的 PeriodicFlusher 定时触发，一阵日志过后缓冲区也不会长时间滞留在内存中。
+    日志器没有关闭就被回收或解释器退出时，weakref.finalize 会把缓冲区中剩余的日志写入文件。
+    """
+
+    def __init__(self, file_path: str, buffer_size: int = 100, flush_interval: float = 1.0,
+                 timestamp_formatter: TimestampFormatter = None):
+        self.file_path = file_path
+        if timestamp_formatter is not None:
+            self.timestamp_formatter = timestamp_formatter
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._file = open(file_path, "a")
+        self._flusher = PeriodicFlusher(self.flush, flush_interval) if flush_interval else None
+        # 回调不能引用 self，否则日志器永远不会被回收；_buffer 只原地清空、不重新赋值，回调看到的始终是同一个列表
+        self._finalizer = weakref.finalize(self, _flush_at_exit, self._lock, self._buffer, self._file)
+
+    def write(self, message: str, level: str):
+        timestamp = self.timestamp_formatter.format()
+        with self._lock:
+            if self._file is None:
+                raise ValueError("日志器已关闭")
+            self._buffer.append(f"[{timestamp}] [{level}] {message}\n")
+            if (len(self._buffer) >= self.buffer_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+
+    def flush(self) -> None:
+        """立即将缓冲区中的日志写入文件"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._buffer and self._file is not None:
+            self._file.write("".join(self._buffer))
+            self._file.flush()
+            self._buffer.clear()
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.stop()
+        with self._lock:
+            if self._file is None:
+                return
+            self._flush_locked()
+            self._file.close()
+            self._file = None
+        self._finalizer.detach()
+
+
+def _flush_at_exit(lock, buffer, file):
+    # 定时刷盘线程是守护线程，退出时可能正持有锁，最多等待 1 秒
+    acquired = lock.acquire(timeout=1.0)
+    try:
+        if buffer and not file.closed:
+            file.write("".join(buffer))
+            buffer.clear()
+        file.close()
+    finally:
+        if acquired:
+            lock.release()
+
+
 class ConsoleLogger(Logger):
     """控制台日志记录器"""
 
-    def log(self, message: str, level: str = "INFO"):
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    def __init__(self, timestamp_formatter: TimestampFormatter = None):
+        if timestamp_formatter is not None:
+            self.timestamp_formatter = timestamp_formatter
+
+    def write(self, message: str, level: str):
+        timestamp = self.timestamp_formatter.format()
         print(f"[{timestamp}] [{level}] {message}")
 
 
+class SQLiteConnectionPool:
+    """简单的 SQLite 连接池，启动时创建固定数量的连接并开启 WAL 模式"""
+
+    def __init__(self, db_path: str, pool_size: int = 2):
+        self.db_path = db_path
+        self._connections = queue.Queue()
+        for _ in range(pool_size):
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._connections.put(conn)
+        self.pool_size = pool_size
+
+    def acquire(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        self._connections.put(conn)
+
+    def close(self) -> None:
+        for _ in range(self.pool_size):
+            self._connections.get().close()
+
+
 class DatabaseLogger(Logger):
-    """数据库日志记录器（模拟实现）"""
+    """数据库日志记录器（SQLite 实现）
+
+    日志先缓存在内存中，缓冲条数达到 batch_size 或距上次写入超过 flush_interval 秒时，
+    从连接池取出一个连接，用 executemany 一次插入整批日志。时间条件同样由后台的 PeriodicFlusher 定时触发。
+    """
+
+    INSERT_SQL = "INSERT INTO logs (created_at, level, message) VALUES (?, ?, ?)"
+
+    def __init__(self, db_path: str = "logs.db", pool_size: int = 2, batch_size: int = 100,
+                 flush_interval: float = 1.0, timestamp_formatter: TimestampFormatter = None):
+        if timestamp_formatter is not None:
+            self.timestamp_formatter = timestamp_formatter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pool = SQLiteConnectionPool(db_path, pool_size)
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._closed = False
+        conn = self.pool.acquire()
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS logs ("
+                         "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "created_at TEXT NOT NULL, level TEXT NOT NULL, message TEXT NOT NULL)")
+            conn.commit()
+        finally:
+            self.pool.release(conn)
+        self._flusher = PeriodicFlusher(self.flush, flush_interval) if flush_interval else None
+
+    def write(self, message: str, level: str):
+        timestamp = self.timestamp_formatter.format()
+        with self._lock:
+            if self._closed:
+                raise ValueError("日志器已关闭")
+            self._buffer.append((timestamp, level, message))
+            if (len(self._buffer) < self.batch_size
+                    and time.monotonic() - self._last_flush < self.flush_interval):
+                return
+            batch = self._take_batch()
+        self._write(batch)
+
+    def flush(self) -> None:
+        """立即将缓冲区中的日志写入数据库"""
+        with self._lock:
+            batch = self._take_batch()
+        self._write(batch)
+
+    def _take_batch(self):
+        batch, self._buffer = self._buffer, []
+        self._last_flush = time.monotonic()
+        return batch
+
+    def _write(self, batch):
+        # 在锁外写库，多个线程可以各自使用连接池中的连接并发写入
+        if not batch:
+            return
+        conn = self.pool.acquire()
+        try:
+            with conn:
+                conn.executemany(self.INSERT_SQL, batch)
+        finally:
+            self.pool.release(conn)
+
+    def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.stop()
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            batch = self._take_batch()
+        self._write(batch)
+        self.pool.close()
+
+
+class AsyncLogger(Logger):
+    """异步日志记录器
+
+    write 只把日志放入有界队列，由后台写线程依次交给被包装的日志器，
+    磁盘或数据库变慢时不会阻塞调用方。队列满时按 overflow 策略处理：
+    block（阻塞等待）、drop_oldest（丢弃最旧的一条）、drop_newest（丢弃当前这条）。
+    """
 
-    def log(self, message: str, level: str = "INFO"):
-        print(f"数据库日志已写入（模拟）: [{level}] {message}")
-        # 实际应用中会包含数据库连接和插入操作
+    OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+    _STOP = object()
+
+    def __init__(self, logger: Logger, max_queue_size: int = 10000, overflow: str = "block"):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"不支持的队列溢出策略: {overflow}")
+        self.logger = logger
+        self.overflow = overflow
+        self.enqueued = 0  # 成功入队的日志条数
+        self.dropped = 0  # 因队列已满被丢弃的日志条数
+        self.failed = 0  # 写线程中被包装日志器抛出异常的条数
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._counter_lock = threading.Lock()
+        # 关闭检查和入队放在同一把锁内，保证 _STOP 之后不会再有日志入队；写线程不获取这把锁，阻塞入队时仍能继续消费
+        self._state_lock = threading.Lock()
+        self._closed = False
+        self._worker = threading.Thread(target=self._drain, name="async-logger", daemon=True)
+        self._worker.start()
+
+    def write(self, message: str, level: str):
+        record = (message, level)
+        with self._state_lock:
+            if self._closed:
+                raise ValueError("日志器已关闭")
+            if self.overflow == "block":
+                self._queue.put(record)
+            elif self.overflow == "drop_newest":
+                try:
+                    self._queue.put_nowait(record)
+                except queue.Full:
+                    self._count_dropped()
+                    return
+            else:
+                while True:
+                    try:
+                        self._queue.put_nowait(record)
+                        break
+                    except queue.Full:
+                        try:
+                            self._queue.get_nowait()
+                            self._count_dropped()
+                        except queue.Empty:
+                            pass
+            with self._counter_lock:
+                self.enqueued += 1
+
+    def _count_dropped(self):
+        with self._counter_lock:
+            self.dropped += 1
+
+    def _drain(self):
+        while True:
+            record = self._queue.get()
+            if record is self._STOP:
+                break
+            try:
+                self.logger.log(*record)
+            except Exception:
+                with self._counter_lock:
+                    self.failed += 1
+
+    def close(self) -> None:
+        """等待队列中的日志全部写完，然后关闭被包装的日志器"""
+        with self._state_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(self._STOP)
+        self._worker.join()
+        self.logger.close()
 
 
 # --------------------- 抽象工厂（LoggerFactory） ---------------------
@@ -79,13 +474,20 @@ class LoggerFactory(ABC):
 
 # --------------------- 具体工厂（Concrete Factories） ---------------------
 class FileLoggerFactory(LoggerFactory):
-    """文件日志工厂"""
+    """文件日志工厂
 
-    def __init__(self, file_path: str):
+    buffer_size 为 None 时创建逐条写入的 FileLogger，否则创建 BufferedFileLogger。
+    """
+
+    def __init__(self, file_path: str, buffer_size: int = None, flush_interval: float = 1.0):
         self.file_path = file_path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
 
-    def create_logger(self) -> FileLogger:
-        return FileLogger(self.file_path)
+    def create_logger(self) -> Logger:
+        if self.buffer_size is None:
+            return FileLogger(self.file_path)
+        return BufferedFileLogger(self.file_path, self.buffer_size, self.flush_interval)
 
 
 class ConsoleLoggerFactory(LoggerFactory):
@@ -98,25 +500,92 @@ class ConsoleLoggerFactory(LoggerFactory):
 class DatabaseLoggerFactory(LoggerFactory):
     """数据库日志工厂"""
 
+    def __init__(self, db_path: str = "logs.db", pool_size: int = 2, batch_size: int = 100,
+                 flush_interval: float = 1.0):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
     def create_logger(self) -> DatabaseLogger:
-        return DatabaseLogger()
+        return DatabaseLogger(self.db_path, self.pool_size, self.batch_size, self.flush_interval)
+
+
+class AsyncLoggerFactory(LoggerFactory):
+    """异步日志工厂，包装任意日志工厂"""
+
+    def __init__(self, factory: LoggerFactory, max_queue_size: int = 10000, overflow: str = "block"):
+        self.factory = factory
+        self.max_queue_size = max_queue_size
+        self.overflow = overflow
+
+    def create_logger(self) -> AsyncLogger:
+        return AsyncLogger(self.factory.create_logger(), self.max_queue_size, self.overflow)
+
+
+# --------------------- 性能对比 ---------------------
+def benchmark_timestamp(n: int = 1_000_000):
+    """对比每条日志调用 strftime 与使用 TimestampFormatter 时每秒可格式化的日志条数"""
+    def strftime_millis():
+        now = time.time()
+        return f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))}.{int(now % 1 * 1000):03d}"
+
+    cases = [
+        ("秒级", lambda: time.strftime("%Y-%m-%d %H:%M:%S"), TimestampFormatter().format),
+        ("毫秒级", strftime_millis, TimestampFormatter(with_millis=True).format),
+    ]
+    for label, before, after in cases:
+        rates = []
+        for fmt in (before, after):
+            start = time.perf_counter()
+            for i in range(n):
+                f"[{fmt()}] [INFO] request {i}"
+            rates.append(n / (time.perf_counter() - start))
+        print(f"{label} {n} 条日志: strftime {rates[0]:,.0f} 条/秒, "
+              f"TimestampFormatter {rates[1]:,.0f} 条/秒, 提升 {rates[1] / rates[0]:.1f} 倍")
 
 
 # --------------------- 客户端使用 ---------------------
 if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        benchmark_timestamp()
+        sys.exit()
+
     # 创建文件日志器（指定日志文件路径）
     file_factory = FileLoggerFactory("app.log")
     file_logger = file_factory.create_logger()
     file_logger.log("应用启动", "INFO")
     file_logger.log("连接数据库失败", "ERROR")
 
-    # 创建控制台日志器
+    # 创建带缓冲的文件日志器，退出 with 语句时自动刷盘并关闭文件
+    buffered_factory = FileLoggerFactory("app.log", buffer_size=100, flush_interval=1.0)
+    with buffered_factory.create_logger() as buffered_logger:
+        for i in range(1000):
+            buffered_logger.log(f"处理请求 {i}", "INFO")
+
+    # 创建控制台日志器（日志器默认共享同一个带缓存的时间戳格式化器）
     console_factory = ConsoleLoggerFactory()
     console_logger = console_factory.create_logger()
     console_logger.log("用户登录成功", "INFO")
     console_logger.log("请求参数校验失败", "WARN")
 
-    # 创建数据库日志器
-    db_factory = DatabaseLoggerFactory()
-    db_logger = db_factory.create_logger()
-    db_logger.log("订单数据已提交", "INFO")
+    # 设置级别阈值后，DEBUG 日志在格式化之前就被丢弃，惰性参数不会被渲染
+    console_logger.set_level(LogLevel.INFO)
+    console_logger.debug("请求详情: %s", {"user": "alice"})
+    console_logger.debug(lambda: f"耗时统计: {sum(range(10 ** 6))}")
+    console_logger.info("用户 %s 下单 %d 件商品", "alice", 3)
+
+    # 创建数据库日志器（连接池 2 个连接，每 100 条批量插入一次）
+    db_factory = DatabaseLoggerFactory("logs.db", pool_size=2, batch_size=100)
+    with db_factory.create_logger() as db_logger:
+        db_logger.log("订单数据已提交", "INFO")
+        for i in range(1000):
+            db_logger.log(f"订单 {i} 已入库", "INFO")
+
+    # 为任意日志工厂加上异步写线程，队列满时丢弃最旧的日志
+    async_factory = AsyncLoggerFactory(FileLoggerFactory("app.log", buffer_size=100),
+                                       max_queue_size=1000, overflow="drop_oldest")
+    with async_factory.create_logger() as async_logger:
+        for i in range(5000):
+            async_logger.log(f"异步处理请求 {i}", "INFO")
+    print(f"异步日志入队 {async_logger.enqueued} 条，丢弃 {async_logger.dropped} 条，写入失败 {async_logger.failed} 条")
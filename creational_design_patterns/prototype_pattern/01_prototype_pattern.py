@@ -5,6 +5,18 @@
 具体原型类（Circle/Square）
 实现 clone() 方法，使用 copy.deepcopy() 进行深拷贝，确保克隆对象与原型对象的属性相互独立。
 包含具体业务属性（如半径、边长、颜色），克隆时这些属性会被完整复制。
+快速原型基类（FastPrototype）
+copy.deepcopy 会遍历整个对象图并维护 memo 字典，对只有不可变字段的扁平对象来说远比直接构造慢。
+FastPrototype 在定义子类时为每个类生成专用的 clone 方法：不可变字段直接浅拷贝，
+只对 mutable_fields 中声明的可变字段做深拷贝，同时支持声明了 __slots__ 的类（如 Polygon）。
+原型注册表（PrototypeRegistry）
+按名字登记原型，clone_many(name, n, **overrides) 一次生成 N 个实例：只预先计算一次模板状态，
+每个实例只复制一份状态字典、深拷贝必要的可变字段，再套用覆盖值；
+覆盖值用 per_instance(values) 包装时按实例逐个取值，否则所有实例使用同一个值。
+写时复制原型（CowPrototype）
+大多数克隆对象创建后从不修改，深拷贝全部状态既耗时又占内存。写时复制模式下，克隆对象共享原型在克隆时刻的状态快照，
+通过属性读取到的容器（包括嵌套容器）一律是只读视图；给字段赋值或通过 edit(field) 取得可修改的容器时，该字段才从共享状态中分离出来。
+原型自身同样通过赋值或 edit 修改，不会影响已有的克隆；只读取原型不会让快照失效。diverged_fields() 返回克隆之后被修改过的字段。
 客户端逻辑
 通过原型对象的 clone() 方法创建新对象，避免重复执行构造函数和初始化逻辑。
 修改克隆对象的属性后，原始对象不受影响，验证了深拷贝的独立性。
@@ -17,13 +29,66 @@
 需要快速生成大量相似对象（如游戏中的角色副本、文档中的段落复制）。
 避免构造函数的复杂性，直接通过已有对象状态生成新对象。
 """
+from collections.abc import Mapping, MutableSet, Sequence, Set
 import copy
+import sys
+import time
+import tracemalloc
 
 # 抽象原型类
 class Prototype:
+    __slots__ = ()
+
     def clone(self):
         raise NotImplementedError("克隆方法未实现")
 
+def _slot_attributes(cls):
+    """返回 cls 各层 __slots__ 声明的 (声明名, 实际属性名)，__x 形式的私有槽位按声明它的类做名字改编"""
+    result = []
+    for klass in reversed(cls.__mro__):
+        slots = klass.__dict__.get("__slots__", ())
+        for name in ((slots,) if isinstance(slots, str) else slots):
+            if name in ("__dict__", "__weakref__"):
+                continue
+            attr = name
+            if name.startswith("__") and not name.endswith("__"):
+                attr = f"_{klass.__name__.lstrip('_')}{name}"
+            result.append((name, attr))
+    return result
+
+# 快速原型基类
+class FastPrototype(Prototype):
+    __slots__ = ()
+    mutable_fields = ()  # 需要深拷贝的可变字段，其余字段视为不可变，直接共享引用
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 只替换基类的 clone 或自动生成的 clone；子类或其祖先手写了 clone 时保留手写版本
+        if getattr(cls.clone, "_generated", False) or cls.clone is Prototype.clone:
+            cls.clone = cls._build_clone()
+
+    @classmethod
+    def _build_clone(cls):
+        lines = ["def clone(self):", "    new = cls.__new__(cls)"]
+        if cls.__dictoffset__:  # 实例带有 __dict__ 时整体浅拷贝
+            lines.append("    new.__dict__.update(self.__dict__)")
+        # 生成逐字段赋值的代码，与手写的 clone 一样没有循环和 memo 字典的开销；未赋值的槽位保持未赋值
+        slots = dict((attr, name) for name, attr in _slot_attributes(cls))  # 实际属性名 -> 声明名
+        fields = [(attr, name in cls.mutable_fields or attr in cls.mutable_fields) for attr, name in slots.items()]
+        # 不在 __slots__ 中的可变字段保存在 __dict__ 里，浅拷贝之后再替换为深拷贝
+        declared = set(slots) | set(slots.values())
+        fields += [(name, True) for name in cls.mutable_fields if name not in declared]
+        for attr, mutable in fields:
+            value = f"deepcopy(self.{attr})" if mutable else f"self.{attr}"
+            lines += ["    try:", f"        new.{attr} = {value}", "    except AttributeError:", "        pass"]
+        lines.append("    return new")
+        namespace = {"cls": cls, "deepcopy": copy.deepcopy}
+        exec("\n".join(lines), namespace)
+        clone = namespace["clone"]
+        clone._generated = True
+        return clone
+
+
 # 具体原型类：圆形
 class Circle(Prototype):
     def __init__(self, radius=1.0, color="red"):
@@ -49,8 +114,319 @@ class Square(Prototype):
     def __str__(self):
         return f"Square(side_length={self.side_length}, color={self.color})"
 
+# 快速原型类：文字标签（普通类，所有字段不可变）
+class Label(FastPrototype):
+    def __init__(self, text="", font="Arial", size=12, color="black"):
+        self.text = text
+        self.font = font
+        self.size = size
+        self.color = color
+
+    def __str__(self):
+        return f"Label(text={self.text}, font={self.font}, size={self.size}, color={self.color})"
+
+# 快速原型类：多边形（__slots__ 类，points 是需要深拷贝的可变字段）
+class Polygon(FastPrototype):
+    __slots__ = ("color", "line_width", "points")
+    mutable_fields = ("points",)
+
+    def __init__(self, points, color="black", line_width=1.0):
+        self.points = points
+        self.color = color
+        self.line_width = line_width
+
+    def __str__(self):
+        return f"Polygon(points={self.points}, color={self.color}, line_width={self.line_width})"
+
+# 原型注册表
+IMMUTABLE_TYPES = (int, float, complex, str, bytes, bool, type(None), frozenset)
+
+class per_instance:
+    """clone_many 的逐实例覆盖值，第 i 个克隆对象使用 values[i]"""
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        self.values = values
+
+class PrototypeRegistry:
+    def __init__(self):
+        self._prototypes = {}
+
+    def register(self, name, prototype):
+        self._prototypes[name] = prototype
+
+    def unregister(self, name):
+        del self._prototypes[name]
+
+    def get(self, name):
+        return self._prototypes[name]
+
+    # name 和 n 只能按位置传入，字段覆盖值中可以出现同名的 name 字段
+    def clone(self, name, /, **overrides):
+        return self.clone_many(name, 1, **overrides)[0]
+
+    def clone_many(self, name, n, /, **overrides):
+        prototype = self._prototypes[name]
+        cls = type(prototype)
+        vectors = {}
+        for field, value in list(overrides.items()):
+            if isinstance(value, per_instance):
+                if len(value.values) != n:
+                    raise ValueError(f"字段 {field} 的覆盖值数量为 {len(value.values)}，应为 {n}")
+                vectors[field] = value.values
+                del overrides[field]
+        if isinstance(prototype, CowPrototype):
+            # 写时复制原型的克隆本身只是共享引用，逐个克隆后再写入覆盖值即可
+            clones = [prototype.clone() for _ in range(n)]
+            shared = [(field, value, not _is_immutable(value)) for field, value in overrides.items()]
+            for i, obj in enumerate(clones):
+                for field, value, mutable in shared:
+                    # 与普通原型一致：可变的共用覆盖值每个克隆深拷贝一份，避免多个克隆共享同一个容器
+                    setattr(obj, field, copy.deepcopy(value) if mutable else value)
+                for field, values in vectors.items():
+                    setattr(obj, field, values[i])
+            return clones
+
+        # 模板状态只计算一次：原型的全部字段加上所有实例共用的覆盖值
+        slots = [attr for _, attr in _slot_attributes(cls) if hasattr(prototype, attr)]
+        state = dict(prototype.__dict__) if cls.__dictoffset__ else {}
+        state.update((slot, getattr(prototype, slot)) for slot in slots)
+        state.update(overrides)
+        mutable_fields = getattr(cls, "mutable_fields", None)
+        if mutable_fields is None:  # 没有声明可变字段时，按取值类型判断
+            mutable_fields = [field for field, value in state.items() if not _is_immutable(value)]
+        deep_fields = [field for field in mutable_fields if field in state and field not in vectors]
+        vector_items = list(vectors.items())
+
+        clones = [None] * n
+        new = cls.__new__
+        if not slots:
+            # 普通类：复制一份状态字典后整体写入 __dict__
+            for i in range(n):
+                obj = new(cls)
+                obj_state = state.copy()
+                for field in deep_fields:
+                    obj_state[field] = copy.deepcopy(state[field])
+                for field, values in vector_items:
+                    obj_state[field] = values[i]
+                obj.__dict__.update(obj_state)
+                clones[i] = obj
+        else:
+            for i in range(n):
+                obj = new(cls)
+                for field, value in state.items():
+                    setattr(obj, field, value)
+                for field in deep_fields:
+                    setattr(obj, field, copy.deepcopy(state[field]))
+                for field, values in vector_items:
+                    setattr(obj, field, values[i])
+                clones[i] = obj
+        return clones
+
+def _is_immutable(value):
+    if isinstance(value, tuple):
+        return all(_is_immutable(item) for item in value)
+    return isinstance(value, IMMUTABLE_TYPES)
+
+# 写时复制原型
+class DictView(Mapping):
+    """共享 dict 的只读视图，嵌套的容器同样以只读视图返回"""
+    __slots__ = ("_data",)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, key):
+        return _readonly_view(self._data[key])
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return repr(self._data)
+
+class ListView(Sequence):
+    """共享 list 的只读视图，嵌套的容器同样以只读视图返回"""
+    __slots__ = ("_data",)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ListView(self._data[index])
+        return _readonly_view(self._data[index])
+
+    def __len__(self):
+        return len(self._data)
+
+    def __eq__(self, other):
+        if isinstance(other, ListView):
+            other = other._data
+        return self._data == other
+
+    def __repr__(self):
+        return repr(self._data)
+
+class SetView(Set):
+    """共享 set 的只读视图"""
+    __slots__ = ("_data",)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __contains__(self, item):
+        return item in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return repr(self._data)
+
+def _readonly_view(value):
+    if isinstance(value, dict):
+        return DictView(value)
+    if isinstance(value, list):
+        return ListView(value)
+    if isinstance(value, (set, MutableSet)):
+        return SetView(value)
+    if isinstance(value, tuple) and not _is_immutable(value):
+        return tuple(_readonly_view(item) for item in value)
+    return value
+
+class CowPrototype(Prototype):
+    """写时复制原型
+
+    字段保存在两层字典中：_cow_base 是与其他克隆共享、不再修改的状态，_cow_local 是本对象独占的字段。
+    clone 时把本对象的独占字段深拷贝一份，与 _cow_base 合并成新的共享状态（快照），本对象的字段仍归自己所有；
+    快照会被后续的 clone 复用，直到本对象给字段赋值或调用 edit 为止，单纯读取字段不会让快照失效。
+    因此通过属性读取的容器（包括嵌套的 dict/list/set）都以只读视图返回，原地修改必须通过 edit 取得可修改的容器；
+    edit 返回的容器在之后的 clone 之后继续修改时需要重新调用 edit，通过其他引用修改传入的容器不在保护范围内。
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        init = cls.__dict__.get("__init__")
+        if init is not None:
+            # 构造过程中写入的字段不算作“克隆后修改过的字段”
+            def __init__(self, *args, **kwargs):
+                init(self, *args, **kwargs)
+                self._cow_dirty.clear()
+            __init__.__doc__ = init.__doc__
+            cls.__init__ = __init__
+
+    def __init__(self):
+        object.__setattr__(self, "_cow_base", {})
+        object.__setattr__(self, "_cow_local", {})
+        object.__setattr__(self, "_cow_dirty", set())
+        object.__setattr__(self, "_cow_snapshot", None)
+
+    def __getattr__(self, name):
+        # 只有实例 __dict__ 中找不到的属性才会进入这里，即所有业务字段
+        try:
+            local = object.__getattribute__(self, "_cow_local")
+            base = object.__getattribute__(self, "_cow_base")
+        except AttributeError:
+            raise AttributeError(name) from None
+        if name in local:
+            return _readonly_view(local[name])
+        if name in base:
+            return _readonly_view(base[name])
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def __setattr__(self, name, value):
+        self._cow_local[name] = value
+        self._cow_dirty.add(name)
+        object.__setattr__(self, "_cow_snapshot", None)
+
+    def edit(self, name):
+        """返回字段的可修改版本，字段仍与其他对象共享时先深拷贝分离出来；调用方可能原地修改，因此快照失效"""
+        local = self._cow_local
+        if name not in local:
+            local[name] = copy.deepcopy(self._cow_base[name])
+            self._cow_dirty.add(name)
+        object.__setattr__(self, "_cow_snapshot", None)
+        return local[name]
+
+    def diverged_fields(self):
+        return frozenset(self._cow_dirty)
+
+    def clone(self):
+        snapshot = self._cow_snapshot
+        if snapshot is None:
+            snapshot = self._cow_base
+            if self._cow_local:
+                snapshot = {**snapshot, **copy.deepcopy(self._cow_local)}
+            object.__setattr__(self, "_cow_snapshot", snapshot)
+        new = type(self).__new__(type(self))
+        object.__setattr__(new, "_cow_base", snapshot)
+        object.__setattr__(new, "_cow_local", {})
+        object.__setattr__(new, "_cow_dirty", set())
+        object.__setattr__(new, "_cow_snapshot", None)
+        return new
+
+# 写时复制原型类：带大量属性数据的图形
+class Sprite(CowPrototype):
+    def __init__(self, name, position=(0, 0), attributes=None, tags=None):
+        super().__init__()
+        self.name = name
+        self.position = position
+        self.attributes = attributes if attributes is not None else {}
+        self.tags = tags if tags is not None else []
+
+    def __str__(self):
+        return f"Sprite(name={self.name}, position={self.position}, attributes={len(self.attributes)} 项, tags={list(self.tags)})"
+
+def benchmark_clone(n=200_000):
+    for prototype in (Label("hello", size=14), Polygon([[0, 0], [1, 0], [1, 1]], color="red")):
+        rates = []
+        for clone in (copy.deepcopy, type(prototype).clone):
+            start = time.perf_counter()
+            for _ in range(n):
+                clone(prototype)
+            rates.append(n / (time.perf_counter() - start))
+        print(f"{type(prototype).__name__}: deepcopy {rates[0]:,.0f} 次/秒，"
+              f"FastPrototype.clone {rates[1]:,.0f} 次/秒，提升 {rates[1] / rates[0]:.1f} 倍")
+
+    registry = PrototypeRegistry()
+    registry.register("circle", Circle(radius=1.0, color="red"))
+    radii = [i * 0.01 for i in range(n)]
+    start = time.perf_counter()
+    for radius in radii:
+        circle = copy.deepcopy(registry.get("circle"))
+        circle.radius = radius
+    before = n / (time.perf_counter() - start)
+    start = time.perf_counter()
+    registry.clone_many("circle", n, radius=per_instance(radii))
+    after = n / (time.perf_counter() - start)
+    print(f"批量生成 {n} 个圆形: 逐个 deepcopy {before:,.0f} 个/秒，clone_many {after:,.0f} 个/秒，"
+          f"提升 {after / before:.1f} 倍")
+
+    template = Sprite("orc", attributes={f"attr_{i}": i for i in range(1000)}, tags=["enemy"] * 100)
+    for label, clone in (("deepcopy", copy.deepcopy), ("写时复制", CowPrototype.clone)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        clones = [clone(template) for _ in range(10_000)]
+        elapsed = time.perf_counter() - start
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"大模板克隆 {len(clones)} 次（{label}）: 每次 {elapsed / len(clones) * 1e6:.1f}us，"
+              f"内存 {size / 2 ** 20:.1f}MB")
+        del clones
+
 # 客户端代码
 if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        benchmark_clone()
+        sys.exit()
+
     # 创建原型实例
     original_circle = Circle(radius=2.0, color="green")
     original_square = Square(side_length=3.0, color="yellow")
@@ -67,4 +443,30 @@ if __name__ == "__main__":
     print("原始圆形:", original_circle)
     print("克隆圆形:", cloned_circle)
     print("原始正方形:", original_square)
-    print("克隆正方形:", cloned_square)
\ No newline at end of file
+    print("克隆正方形:", cloned_square)
+
+    # 快速克隆：不可变字段共享，可变字段 points 独立
+    original_polygon = Polygon([[0, 0], [2, 0], [1, 2]], color="purple")
+    cloned_polygon = original_polygon.clone()
+    cloned_polygon.points.append([0, 1])
+    print("原始多边形:", original_polygon)
+    print("克隆多边形:", cloned_polygon)
+
+    # 通过原型注册表批量生成：颜色统一覆盖，半径逐个指定
+    registry = PrototypeRegistry()
+    registry.register("circle", original_circle)
+    registry.register("polygon", original_polygon)
+    circles = registry.clone_many("circle", 3, color="orange", radius=per_instance([1.0, 1.5, 2.0]))
+    print("批量克隆圆形:", [str(circle) for circle in circles])
+    polygons = registry.clone_many("polygon", 2, line_width=per_instance([1.0, 2.0]))
+    polygons[0].points.append([5, 5])
+    print("批量克隆多边形:", [str(polygon) for polygon in polygons])
+
+    # 写时复制：克隆共享原型的属性数据，只在写入的字段上分离
+    template = Sprite("orc", attributes={"hp": 100, "attack": 12}, tags=["enemy"])
+    orc = template.clone()
+    orc.position = (10, 20)
+    orc.edit("attributes")["hp"] = 80
+    print("模板:", template)
+    print("克隆:", orc, "已修改字段:", sorted(orc.diverged_fields()))
+    print("tags 仍与模板共享:", type(orc.tags).__name__, template.attributes["hp"], orc.attributes["hp"])
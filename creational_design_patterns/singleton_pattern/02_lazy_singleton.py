@@ -14,4 +14,78 @@ class Singleton:
 
 s1 = Singleton()
 s2 = Singleton()
-print(s1 is s2)
\ No newline at end of file
+print(s1 is s2)
+"""
+双重检查锁（Double-Checked Locking）
+上面的懒汉式在每次实例化时都要获取锁，即使实例早已创建，多线程下所有调用都会在同一把锁上排队。
+双重检查锁先在不加锁的情况下检查实例是否存在，只有首次创建时才加锁并再次检查。
+用元类实现可以复用到任意类：每个子类拥有各自的实例，并且 __init__ 只会执行一次。
+每个类使用自己的锁，一个单例在 __init__ 中创建另一个单例（例如服务依赖配置）时不会互相阻塞。示例代码如下：
+"""
+import time
+
+
+class SingletonMeta(type):
+    _instances = {}
+    _locks = {}  # 类 -> 该类首次创建时使用的锁
+    _locks_guard = threading.Lock()  # 只保护 _locks 字典本身，持有时间极短
+
+    def __call__(cls, *args, **kwargs):
+        instance = SingletonMeta._instances.get(cls)  # 快速路径：实例已存在时不加锁
+        if instance is None:
+            with SingletonMeta._locks_guard:
+                lock = SingletonMeta._locks.setdefault(cls, threading.RLock())
+            with lock:
+                instance = SingletonMeta._instances.get(cls)  # 加锁后再检查一次，防止重复创建
+                if instance is None:
+                    instance = super().__call__(*args, **kwargs)
+                    SingletonMeta._instances[cls] = instance
+        return instance
+
+
+class AppConfig(metaclass=SingletonMeta):
+    def __init__(self):
+        print(f"{type(self).__name__} 初始化")  # 每个类只会打印一次
+        self.settings = {}
+
+
+class DBConfig(AppConfig):
+    pass
+
+
+class Service(metaclass=SingletonMeta):
+    def __init__(self):
+        self.config = DBConfig()  # 在单例的 __init__ 中获取另一个单例
+
+
+c1 = AppConfig()
+c2 = AppConfig()
+d1 = DBConfig()
+print(c1 is c2, c1 is d1, d1 is DBConfig())
+print(Service().config is d1)
+
+
+def benchmark(cls, threads, calls_per_thread=200_000):
+    cls()
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(calls_per_thread):
+            cls()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for w in workers:
+        w.join()
+    return threads * calls_per_thread / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    for threads in (1, 8, 32):
+        locked = benchmark(Singleton, threads)
+        double_checked = benchmark(AppConfig, threads)
+        print(f"{threads} 个线程：懒汉式加锁 {locked:,.0f} 次/秒，双重检查锁 {double_checked:,.0f} 次/秒")
@@ -0,0 +1,133 @@
+"""
+单例注册表
+配置、连接池等昂贵的共享资源通常以单例形式存在，但前两个示例只考虑了同步、单进程的创建过程。
+单例注册表按名字集中管理这些单例的工厂函数和实例：
+异步初始化：工厂可以是 async 函数，多个协程同时获取同一个单例时，只会有一个初始化任务，其余协程等待同一个结果。
+fork 安全：通过 os.register_at_fork 在子进程中清空实例，避免多个工作进程共用父进程创建的连接池等资源。
+初始化耗时：记录每个单例的初始化时间，便于启动时排查哪个资源拖慢了启动。
+"""
+import asyncio
+import inspect
+import os
+import threading
+import time
+
+
+class SingletonRegistry:
+    def __init__(self):
+        self._factories = {}  # 名字 -> (工厂函数, 子进程中是否重置)
+        self._instances = {}
+        self._pending = {}  # 名字 -> 正在进行的异步初始化任务
+        self._init_times = {}
+        self._name_locks = {}  # 名字 -> 该单例首次创建时使用的锁
+        self._lock = threading.Lock()  # 只保护 _name_locks 字典本身，不在持有时调用工厂
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def register(self, name, factory=None, reset_on_fork=True):
+        # 既可以直接调用，也可以作为装饰器使用：@registry.register("config")
+        if factory is None:
+            return lambda f: self.register(name, f, reset_on_fork) or f
+        self._factories[name] = (factory, reset_on_fork)
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        factory, _ = self._factories[name]
+        if inspect.iscoroutinefunction(factory):
+            raise TypeError(f"单例 {name} 使用异步工厂，请使用 await registry.aget({name!r})")
+        # 每个单例一把锁：工厂中获取其他单例（例如连接池依赖配置）不会被阻塞
+        with self._lock:
+            name_lock = self._name_locks.setdefault(name, threading.RLock())
+        with name_lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                start = time.perf_counter()
+                instance = factory()
+                self._init_times[name] = time.perf_counter() - start
+                self._instances[name] = instance
+        return instance
+
+    async def aget(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        factory, _ = self._factories[name]
+        if not inspect.iscoroutinefunction(factory):
+            return self.get(name)
+        task = self._pending.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._create_async(name, factory))
+            self._pending[name] = task
+        return await asyncio.shield(task)
+
+    async def _create_async(self, name, factory):
+        start = time.perf_counter()
+        try:
+            instance = await factory()
+            self._init_times[name] = time.perf_counter() - start
+            self._instances[name] = instance
+            return instance
+        finally:
+            # 初始化失败时移除任务，下一次获取会重新尝试
+            self._pending.pop(name, None)
+
+    def _reset_after_fork(self):
+        # fork 时其他线程可能正持有锁，子进程中重新创建锁
+        self._lock = threading.Lock()
+        self._name_locks = {}
+        self._pending = {}
+        for name, (_, reset_on_fork) in self._factories.items():
+            if reset_on_fork:
+                self._instances.pop(name, None)
+                self._init_times.pop(name, None)
+
+    def init_times(self):
+        return dict(self._init_times)
+
+    def report(self):
+        for name, seconds in sorted(self._init_times.items(), key=lambda item: -item[1]):
+            print(f"单例 {name} 初始化耗时 {seconds * 1000:.1f}ms")
+
+
+registry = SingletonRegistry()
+
+
+@registry.register("config", reset_on_fork=False)
+def load_config():
+    time.sleep(0.05)  # 模拟读取配置文件
+    return {"db_path": "app.db", "pool_size": 4}
+
+
+@registry.register("pool")
+async def create_pool():
+    print(f"进程 {os.getpid()} 创建连接池")
+    await asyncio.sleep(0.1)  # 模拟异步建立连接
+    return {"owner_pid": os.getpid(), "connections": registry.get("config")["pool_size"]}
+
+
+@registry.register("db_url")
+def build_db_url():
+    return f"sqlite:///{registry.get('config')['db_path']}"  # 同步工厂中获取另一个单例
+
+
+async def main():
+    # 100 个协程同时获取连接池，只会初始化一次
+    pools = await asyncio.gather(*(registry.aget("pool") for _ in range(100)))
+    print(all(pool is pools[0] for pool in pools))
+    print(registry.get("db_url"))
+    registry.report()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+
+    if hasattr(os, "fork"):
+        pid = os.fork()
+        if pid == 0:
+            # 子进程中连接池被重置，会重新创建属于自己的连接池；配置不需要重置
+            pool = asyncio.run(registry.aget("pool"))
+            print(f"子进程连接池属于进程 {pool['owner_pid']}，配置对象沿用父进程: {'config' in registry.init_times()}")
+            os._exit(0)
+        os.waitpid(pid, 0)
@@ -3,34 +3,323 @@
 场景描述
 设计一个日志系统，支持不同日志级别（调试、信息、错误）和不同输出目标（文件、控制台、数据库），要求两者可自由组合。
 抽象与实现分离
+级别过滤：每个日志对象持有一个阈值 threshold，log 在任何字符串处理之前先比较级别，
+被过滤的日志不会拼接字符串；消息支持 %-格式参数或可调用对象，只有通过过滤后才渲染。
+滚动文件输出：RotatingFileOutput 常驻文件句柄，按大小或时间滚动，只保留最近 N 个分段，
+滚动出的分段交给后台线程压缩（gzip/lzma），写日志的线程不会等待压缩完成。清理旧分段时只按序号删除
+比刚归档的分段早 N 个以上的分段，仍在排队等待压缩的新分段不会被删除；后台失败计入 failures 并输出到 stderr。
+多路输出：FanOutOutput 本身也是一个 OutputTarget，把同一条日志并发写到多个输出目标，
+每个目标有独立的工作线程和有界队列、异常隔离、超时和耗时统计。队列已满时直接丢弃并计数，
+调用方也只等待原本空闲的目标，已经积压的慢目标既不会无限占用内存，也不会拖慢调用方和其他目标。
 """
+from concurrent.futures import ThreadPoolExecutor
+from enum import IntEnum
+import glob
+import gzip
+import lzma
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+
+
+class Severity(IntEnum):
+    DEBUG = 10
+    INFO = 20
+    ERROR = 40
 
 
 class LogLevel:
-    def __init__(self, output_target):
+    severity = Severity.DEBUG
+
+    def __init__(self, output_target, threshold=Severity.DEBUG):
         self.output_target = output_target  # 桥接输出目标
+        self.threshold = threshold
+
+    def set_threshold(self, threshold):
+        self.threshold = threshold
+
+    def is_enabled(self):
+        return self.severity >= self.threshold
+
+    def log(self, message, *args):
+        if self.severity < self.threshold:
+            return
+        if args:
+            message = message % args
+        elif callable(message):
+            message = message()
+        self.output_target.write(self.format(message))
 
-    def log(self, message):
+    def format(self, message):
         raise NotImplementedError
 
 class DebugLog(LogLevel):
-    def log(self, message):
-        formatted_msg = f"[DEBUG] {message}"
-        self.output_target.write(formatted_msg)
+    severity = Severity.DEBUG
+
+    def format(self, message):
+        return f"[DEBUG] {message}"
+
+
+class InfoLog(LogLevel):
+    severity = Severity.INFO
+
+    def format(self, message):
+        return f"[INFO] {message}"
+
+
+class ErrorLog(LogLevel):
+    severity = Severity.ERROR
+
+    def format(self, message):
+        return f"[ERROR] {message}"
 
 
 class OutputTarget:
     def write(self, message):
         raise NotImplementedError
 
+    def close(self):
+        pass
+
 
 class FileOutput(OutputTarget):
+    def __init__(self, path="log.txt"):
+        self.path = path
+
     def write(self, message):
-        with open("log.txt", "a") as f:
+        with open(self.path, "a") as f:
             f.write(message + "\n")
 
 
+class RotatingFileOutput(OutputTarget):
+    COMPRESSORS = {"gzip": (gzip.open, ".gz"), "lzma": (lzma.open, ".xz")}
+
+    def __init__(self, path="log.txt", max_bytes=10 * 1024 * 1024, rotate_interval=None,
+                 backup_count=5, compression=None):
+        if compression is not None and compression not in self.COMPRESSORS:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval  # 单位：秒，None 表示不按时间滚动
+        self.backup_count = backup_count
+        self.compression = compression
+        self.failures = 0  # 后台压缩或清理失败的次数
+        self.last_error = None
+        self._lock = threading.Lock()
+        # 单线程执行器保证压缩和清理旧分段按滚动顺序依次执行
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-rotate")
+        self._segment_pattern = re.compile(re.escape(os.path.basename(path)) + r"\.(\d+)(\.gz|\.xz)?$")
+        self._sequence = max((seq for seq, _ in self._segments()), default=0)
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        self._opened_at = time.monotonic()
+
+    def _segments(self):
+        segments = []
+        for name in glob.glob(glob.escape(self.path) + ".*"):
+            match = self._segment_pattern.match(os.path.basename(name))
+            if match:
+                segments.append((int(match.group(1)), name))
+        return sorted(segments)
+
+    def write(self, message):
+        data = message.encode("utf-8") + b"\n"
+        with self._lock:
+            if self._should_rollover(len(data)):
+                self._rollover()
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+
+    def _should_rollover(self, incoming):
+        if self._size == 0:
+            return False
+        if self.max_bytes and self._size + incoming > self.max_bytes:
+            return True
+        return (self.rotate_interval is not None
+                and time.monotonic() - self._opened_at >= self.rotate_interval)
+
+    def _rollover(self):
+        self._file.close()
+        self._sequence += 1
+        segment = f"{self.path}.{self._sequence}"
+        os.replace(self.path, segment)
+        self._open()
+        future = self._executor.submit(self._archive, self._sequence, segment)
+        future.add_done_callback(self._archive_done)
+
+    def _archive_done(self, future):
+        error = future.exception()
+        if error is not None:
+            self.failures += 1
+            self.last_error = error
+            print(f"RotatingFileOutput 归档失败: {error!r}", file=sys.stderr)
+
+    def _archive(self, sequence, segment):
+        # 在后台线程中运行：压缩刚滚动出的分段，然后删除超出保留数量的旧分段
+        if self.compression is not None:
+            opener, suffix = self.COMPRESSORS[self.compression]
+            tmp_path = segment + suffix + ".tmp"
+            with open(segment, "rb") as src, opener(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp_path, segment + suffix)
+            os.remove(segment)
+        # 只删除序号不超过 sequence - backup_count 的分段，比 sequence 新的分段可能还在排队等待压缩
+        for seq, name in self._segments():
+            if seq > sequence - self.backup_count:
+                break
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass  # 已被其他进程或手工清理
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+        self._executor.shutdown(wait=True)
+
+
 class ConsoleOutput(OutputTarget):
     def write(self, message):
         print(message)
-        
\ No newline at end of file
+
+
+class SinkStats:
+    def __init__(self):
+        self.writes = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.dropped = 0  # 队列已满被丢弃的日志条数
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_error = None
+
+    @property
+    def avg_latency(self):
+        return self.total_latency / self.writes if self.writes else 0.0
+
+    def __repr__(self):
+        return (f"SinkStats(writes={self.writes}, errors={self.errors}, timeouts={self.timeouts}, dropped={self.dropped}, "
+                f"avg_latency={self.avg_latency * 1000:.3f}ms, max_latency={self.max_latency * 1000:.3f}ms)")
+
+
+class FanOutOutput(OutputTarget):
+    _STOP = object()
+
+    def __init__(self, targets, timeout=1.0, wait_for_sinks=True, max_pending=1000):
+        self.targets = list(targets)
+        self.timeout = timeout  # 单位：秒，每条日志最多等待各目标写完的时间
+        self.wait_for_sinks = wait_for_sinks
+        self.stats = {target: SinkStats() for target in self.targets}
+        self._stats_lock = threading.Lock()
+        self._pending = {target: 0 for target in self.targets}  # 已入队但尚未写完的日志条数
+        # 每个目标一个工作线程和一个有界队列：同一目标内日志保持顺序，慢目标最多积压 max_pending 条
+        self._queues = {target: queue.Queue(maxsize=max_pending) for target in self.targets}
+        self._workers = [
+            threading.Thread(target=self._drain, args=(target,), name=f"sink-{type(target).__name__}", daemon=True)
+            for target in self.targets
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def write(self, message):
+        waiting = []
+        for target in self.targets:
+            with self._stats_lock:
+                # 只等待原本空闲的目标，已有积压的目标等了也写不完
+                idle = self._pending[target] == 0
+                self._pending[target] += 1
+            done = threading.Event() if self.wait_for_sinks and idle else None
+            try:
+                self._queues[target].put_nowait((message, done))
+            except queue.Full:
+                with self._stats_lock:
+                    self._pending[target] -= 1
+                    self.stats[target].dropped += 1
+                continue
+            if done is not None:
+                waiting.append((target, done))
+        deadline = time.monotonic() + self.timeout
+        for target, done in waiting:
+            if not done.wait(max(0.0, deadline - time.monotonic())):
+                with self._stats_lock:
+                    self.stats[target].timeouts += 1
+
+    def _drain(self, target):
+        records = self._queues[target]
+        while True:
+            record = records.get()
+            if record is self._STOP:
+                return
+            message, done = record
+            self._write_one(target, message)
+            with self._stats_lock:
+                self._pending[target] -= 1
+            if done is not None:
+                done.set()
+
+    def _write_one(self, target, message):
+        start = time.perf_counter()
+        error = None
+        try:
+            target.write(message)
+        except Exception as e:
+            error = e
+        latency = time.perf_counter() - start
+        with self._stats_lock:
+            stats = self.stats[target]
+            stats.writes += 1
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+            if error is not None:
+                stats.errors += 1
+                stats.last_error = error
+
+    def close(self):
+        # 等待各目标写完已入队的日志后再关闭
+        for target in self.targets:
+            self._queues[target].put(self._STOP)
+        for target, worker in zip(self.targets, self._workers):
+            worker.join()
+            target.close()
+
+
+if __name__ == "__main__":
+    console = ConsoleOutput()
+    debug_log = DebugLog(console, threshold=Severity.INFO)
+    info_log = InfoLog(console, threshold=Severity.INFO)
+
+    # DEBUG 低于阈值，直接返回，参数和回调都不会被渲染
+    debug_log.log("请求体: %r", {"user": "alice"})
+    debug_log.log(lambda: f"缓存状态: {sorted(range(10 ** 6))[-1]}")
+    info_log.log("用户 %s 登录成功", "alice")
+
+    # 每个分段最大 64KB，保留 3 个 gzip 压缩后的历史分段
+    rotating = RotatingFileOutput("app.log", max_bytes=64 * 1024, backup_count=3, compression="gzip")
+    error_log = ErrorLog(rotating)
+    for i in range(10000):
+        error_log.log("请求 %d 处理失败", i)
+    rotating.close()
+
+    # 同一条日志并发写入控制台、文件和一个很慢的输出目标
+    class SlowOutput(OutputTarget):
+        def write(self, message):
+            time.sleep(0.5)
+
+    # 慢目标只在空闲时被等待一次，之后的日志进入它的队列，队列满后直接丢弃
+    fan_out = FanOutOutput([ConsoleOutput(), FileOutput("app.log"), SlowOutput()], timeout=0.1, max_pending=2)
+    error_log = ErrorLog(fan_out)
+    start = time.perf_counter()
+    for i in range(5):
+        error_log.log("支付服务 %d 调用超时", i)
+    print(f"5 条日志耗时 {time.perf_counter() - start:.2f}s")
+    fan_out.close()
+    for target, stats in fan_out.stats.items():
+        print(type(target).__name__, stats)
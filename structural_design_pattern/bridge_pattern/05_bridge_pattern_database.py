@@ -4,37 +4,423 @@
 开发一个通用数据库访问框架，支持增删改查（CRUD）操作和不同数据库（MySQL、PostgreSQL、MongoDB），要求操作和数据库实现分离。
 抽象与实现分离
 抽象部分（数据操作）：定义 DataOperation 抽象类，声明操作接口（如 insert(), select()），持有数据库连接的引用。
+实现部分（数据库连接）：DBConnection 除了执行原始 SQL 的 execute_sql，还提供参数化的 execute(sql, params)
+和批量的 executemany(sql, seq_of_params)。SQL 文本与参数分离后，同一条语句只需预编译一次，
+每个连接按 SQL 文本维护一个预编译语句缓存（LRU）。SQLiteConnection 是可在本地运行的真实实现。
+批量接口：insert_many 把任意可迭代对象按 batch_size 分块交给 executemany，select_iter 通过 fetchmany
+分批流式读取结果，两者都不会一次性把全部数据放进内存，并且都只依赖 DBConnection，所有数据库实现通用。
+连接池：ConnectionPool 自身也实现了 DBConnection 接口，每次调用时借出一个连接、执行并提交后归还（执行失败时先回滚），
+因此把连接池交给 UserTable 与交给单个连接的用法完全相同。连接归还后可能立刻被其他线程借走，
+所以连接池的 execute_sql/execute/executemany 不返回游标，而是在归还前取出全部结果行（查询语句）
+或受影响的行数；需要流式读取大结果集时使用 fetch_iter，它在迭代期间一直占用同一个连接。
+连接池线程安全，支持最小/最大连接数、按需创建、空闲回收、借出时健康检查和等待超时，并统计借出等待时间与连接池饱和度。
 """
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from itertools import islice
+import sqlite3
+import tempfile
+import threading
+import time
 
 
 class DataOperation:
+    batch_size = 1000
+
     def __init__(self, db_connection):
         self.db_connection = db_connection  # 桥接数据库连接
 
     def insert(self, data):
         raise NotImplementedError
 
+    def insert_statement(self, column_count):
+        raise NotImplementedError
+
+    def format_data(self, data):
+        return data
+
+    def insert_many(self, rows, batch_size=None):
+        batch_size = batch_size or self.batch_size
+        rows = iter(rows)
+        total = 0
+        while True:
+            chunk = [self.format_data(row) for row in islice(rows, batch_size)]
+            if not chunk:
+                return total
+            self.db_connection.executemany(self.insert_statement(len(chunk[0])), chunk)
+            total += len(chunk)
+
+    def select_iter(self, query, params=(), batch_size=None):
+        return self.db_connection.fetch_iter(query, params, batch_size or self.batch_size)
+
 
 class UserTable(DataOperation):
     def insert(self, user_data):
         formatted_data = self.format_data(user_data)
-        self.db_connection.execute_sql(f"INSERT INTO users VALUES {formatted_data}")
+        # SQL 文本只与列数有关，重复插入时命中预编译语句缓存
+        self.db_connection.execute(self.insert_statement(len(formatted_data)), formatted_data)
+
+    def insert_statement(self, column_count):
+        placeholders = ", ".join([self.db_connection.placeholder] * column_count)
+        return f"INSERT INTO users VALUES ({placeholders})"
 
     def format_data(self, data):
         # 数据格式化逻辑（与数据库无关）
-        return data
+        return tuple(data)
 
 
 class DBConnection:
+    placeholder = "?"  # 参数占位符，不同数据库驱动写法不同
+    statement_cache_size = 128
+
+    def __init__(self):
+        self._statements = OrderedDict()  # SQL 文本 -> 预编译语句
+        self.cache_hits = 0
+        self.cache_misses = 0
+
     def execute_sql(self, sql):
         raise NotImplementedError
 
+    def prepare(self, sql):
+        statement = self._statements.get(sql)
+        if statement is not None:
+            self.cache_hits += 1
+            self._statements.move_to_end(sql)
+            return statement
+        self.cache_misses += 1
+        statement = self._prepare(sql)
+        self._statements[sql] = statement
+        if len(self._statements) > self.statement_cache_size:
+            self._statements.popitem(last=False)
+        return statement
+
+    def _prepare(self, sql):
+        raise NotImplementedError
+
+    def execute(self, sql, params=()):
+        raise NotImplementedError
+
+    def executemany(self, sql, seq_of_params):
+        for params in seq_of_params:
+            self.execute(sql, params)
+
+    def fetch_iter(self, sql, params=(), batch_size=1000):
+        cursor = self.execute(sql, params)
+        if cursor is None:
+            return
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def ping(self):
+        return True
+
+    def close(self):
+        pass
+
 
 class MySQLConnection(DBConnection):
+    placeholder = "%s"
+
     def execute_sql(self, sql):
         print(f"MySQL 执行：{sql}")
 
+    def _prepare(self, sql):
+        print(f"MySQL 预编译：{sql}")
+        return sql
+
+    def execute(self, sql, params=()):
+        self.prepare(sql)
+        print(f"MySQL 执行预编译语句：{sql} 参数：{params}")
+
 
 class PostgreSQLConnection(DBConnection):
+    placeholder = "%s"
+
     def execute_sql(self, sql):
         print(f"PostgreSQL 执行：{sql}")
+
+    def _prepare(self, sql):
+        print(f"PostgreSQL 预编译：{sql}")
+        return sql
+
+    def execute(self, sql, params=()):
+        self.prepare(sql)
+        print(f"PostgreSQL 执行预编译语句：{sql} 参数：{params}")
+
+
+class SQLiteConnection(DBConnection):
+    def __init__(self, database=":memory:"):
+        super().__init__()
+        # sqlite3 模块按 SQL 文本缓存已编译的语句，容量与本连接的语句缓存保持一致
+        # 连接可能被连接池在不同线程间借出（同一时刻只被一个线程使用），因此关闭线程检查
+        self.conn = sqlite3.connect(database, cached_statements=self.statement_cache_size,
+                                    check_same_thread=False)
+
+    def execute_sql(self, sql):
+        return self.conn.execute(sql)
+
+    def _prepare(self, sql):
+        # sqlite3 没有显式的 prepare 接口，首次执行时由驱动编译并放入其内部缓存
+        return sql
+
+    def execute(self, sql, params=()):
+        self.prepare(sql)
+        return self.conn.execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        self.prepare(sql)
+        return self.conn.executemany(sql, seq_of_params)
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def ping(self):
+        try:
+            self.conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self.conn.close()
+
+
+class PoolStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.created = 0
+        self.evicted = 0
+        self.unhealthy = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+    @property
+    def avg_wait(self):
+        return self.total_wait / self.checkouts if self.checkouts else 0.0
+
+    def __repr__(self):
+        return (f"PoolStats(checkouts={self.checkouts}, created={self.created}, evicted={self.evicted}, "
+                f"unhealthy={self.unhealthy}, timeouts={self.timeouts}, "
+                f"avg_wait={self.avg_wait * 1000:.3f}ms, max_wait={self.max_wait * 1000:.3f}ms, "
+                f"in_use={self.in_use}, peak_in_use={self.peak_in_use})")
+
+
+class ConnectionPool(DBConnection):
+    def __init__(self, connection_factory, min_size=1, max_size=10, idle_timeout=300.0,
+                 wait_timeout=5.0, health_check=None):
+        super().__init__()
+        self.connection_factory = connection_factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout  # 单位：秒，超过该时间未使用的连接会被回收（保留 min_size 个）
+        self.wait_timeout = wait_timeout  # 单位：秒，连接全部被借出时最多等待的时间
+        self.health_check = health_check or (lambda conn: conn.ping())
+        self.stats = PoolStats()
+        self._idle = deque()  # (连接, 归还时间)，右端是最近归还的连接
+        self._size = 0
+        self._placeholder = None
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def placeholder(self):
+        if self._placeholder is None:
+            with self.connection() as conn:
+                self._placeholder = conn.placeholder
+        return self._placeholder
+
+    @property
+    def saturation(self):
+        return self.stats.in_use / self.max_size
+
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.wait_timeout
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise ValueError("连接池已关闭")
+                    self._evict_idle_locked()
+                    if self._idle:
+                        conn, _ = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        self.stats.timeouts += 1
+                        raise TimeoutError(f"等待数据库连接超时（{self.wait_timeout}s）")
+            # 创建连接和健康检查可能较慢，在锁外进行
+            if conn is None:
+                try:
+                    conn = self.connection_factory()
+                except Exception:
+                    self._discard(None)
+                    raise
+                self.stats.created += 1
+            elif not self.health_check(conn):
+                self.stats.unhealthy += 1
+                self._discard(conn)
+                continue
+            wait = time.monotonic() - start
+            with self._cond:
+                self.stats.checkouts += 1
+                self.stats.total_wait += wait
+                self.stats.max_wait = max(self.stats.max_wait, wait)
+                self.stats.in_use += 1
+                self.stats.peak_in_use = max(self.stats.peak_in_use, self.stats.in_use)
+            return conn
+
+    def release(self, conn, broken=False):
+        # 出错后无法恢复的连接，或连接池关闭后才归还的连接，直接关闭而不放回空闲队列
+        with self._cond:
+            self.stats.in_use -= 1
+            if not broken and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    def _discard(self, conn):
+        if conn is not None:
+            conn.close()
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _evict_idle_locked(self):
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            conn, _ = self._idle.popleft()
+            conn.close()
+            self._size -= 1
+            self.stats.evicted += 1
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            # 语句失败时先回滚，避免连接带着未结束的事务（以及数据库锁）回到池中
+            try:
+                conn.rollback()
+            except Exception:
+                self.release(conn, broken=True)
+                raise
+            self.release(conn)
+            raise
+        self.release(conn)
+
+    def execute_sql(self, sql):
+        with self.connection() as conn:
+            result = _materialize(conn.execute_sql(sql))
+            conn.commit()
+            return result
+
+    def execute(self, sql, params=()):
+        with self.connection() as conn:
+            result = _materialize(conn.execute(sql, params))
+            conn.commit()
+            return result
+
+    def executemany(self, sql, seq_of_params):
+        with self.connection() as conn:
+            result = _materialize(conn.executemany(sql, seq_of_params))
+            conn.commit()
+            return result
+
+    def fetch_iter(self, sql, params=(), batch_size=1000):
+        # 流式读取期间一直占用同一个连接，迭代结束或生成器关闭时归还
+        with self.connection() as conn:
+            yield from conn.fetch_iter(sql, params, batch_size)
+
+    def close(self):
+        # 正在被借出的连接在归还时关闭
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            while self._idle:
+                conn, _ = self._idle.pop()
+                conn.close()
+                self._size -= 1
+
+
+def _materialize(cursor):
+    # 在连接归还前读完游标：查询语句返回全部结果行，其他语句返回受影响的行数
+    if cursor is None or not hasattr(cursor, "description"):
+        return cursor
+    if cursor.description is not None:
+        return cursor.fetchall()
+    return cursor.rowcount
+
+
+def benchmark_insert(n=100_000):
+    rows = [(i, f"user{i}", i % 100) for i in range(n)]
+    cases = {
+        "f-string 拼接 SQL": lambda conn: [conn.execute_sql(f"INSERT INTO users VALUES {row}") for row in rows],
+        "参数化 execute": lambda conn: [UserTable(conn).insert(row) for row in rows],
+        "executemany": lambda conn: conn.executemany("INSERT INTO users VALUES (?, ?, ?)", rows),
+        "insert_many 分批": lambda conn: UserTable(conn).insert_many(iter(rows), batch_size=5000),
+    }
+    for name, run in cases.items():
+        conn = SQLiteConnection()
+        conn.execute_sql("CREATE TABLE users (id INTEGER, name TEXT, age INTEGER)")
+        start = time.perf_counter()
+        run(conn)
+        conn.commit()
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {n} 行耗时 {elapsed:.3f}s（{n / elapsed:,.0f} 行/秒）")
+
+
+if __name__ == "__main__":
+    users = UserTable(MySQLConnection())
+    users.insert((1, "alice", 30))
+    users.insert((2, "bob", 25))  # 相同 SQL 文本，不再重复预编译
+
+    benchmark_insert()
+
+    # 生成器逐批产生数据、逐批写入、逐批读出，全程不需要完整的数据集
+    users = UserTable(SQLiteConnection())
+    users.db_connection.execute_sql("CREATE TABLE users (id INTEGER, name TEXT, age INTEGER)")
+    inserted = users.insert_many(((i, f"user{i}", i % 100) for i in range(1_000_000)), batch_size=10_000)
+    adults = sum(1 for _ in users.select_iter("SELECT * FROM users WHERE age >= ?", (18,), batch_size=5000))
+    print(f"流式写入 {inserted} 行，流式读出 {adults} 行")
+
+    # 把连接池交给 UserTable，用法与单个连接相同；多个线程并发写入同一个 SQLite 文件
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = f"{tmp_dir}/users.db"
+        SQLiteConnection(db_path).execute_sql("CREATE TABLE users (id INTEGER, name TEXT, age INTEGER)")
+        pool = ConnectionPool(lambda: SQLiteConnection(db_path), min_size=1, max_size=4, wait_timeout=30.0)
+        users = UserTable(pool)
+
+        def worker(offset):
+            users.insert_many(((offset + i, f"user{offset + i}", i % 100) for i in range(10_000)), batch_size=500)
+
+        threads = [threading.Thread(target=worker, args=(n * 10_000,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        total = sum(1 for _ in users.select_iter("SELECT id FROM users"))
+        print(f"8 个线程通过连接池写入 {total} 行")
+        print(pool.stats)
+        pool.close()
@@ -1,7 +1,28 @@
 """
 组合模式是一种结构型设计模式，它允许你将对象组合成树形结构以表示 “部分 - 整体” 的层次结构。下面是一个简单的组合模式的 Python 代码示例：
+遍历：递归实现的 operation 在很深的树上会超过 Python 的递归深度限制，并且每一层都要拼接一次子树的结果字符串。
+这里用显式栈实现前序、后序和广度优先遍历生成器，iter_operation 按顺序逐段产出结果片段，
+operation 只在最后做一次拼接。
+缓存：每个组合节点缓存自己子树的数值聚合结果（total 合计、size 节点数），节点通过 parent 指向父节点。
+add/remove 或叶子的 name/value 被修改时，沿 parent 链向上清空缓存，遇到已失效的节点即停止；
+再次查询只需重新计算失效路径上的节点，其余子树直接复用缓存。
+operation 字符串的长度与子树规模成正比，如果每一层都缓存，深树上的总内存与深度成平方关系，
+因此只在被查询的节点上缓存一次 "".join(iter_operation()) 的结果，子孙节点只记录一个占位标记，保证修改时能把失效传到该节点。
+子节点容器：children 由以对象 id 为键的字典保存，既保持插入顺序，remove 又是 O(1)，不再线性扫描并调用 __eq__。
+名字索引：每个组合节点同时按名字索引自己的子节点，在 add/remove/改名时同步维护，
+find("Composite1/Leaf1") 按路径逐级查找，耗时只与路径深度有关；节点整体移动或改名时也无需重建整棵树的索引。
+把已有父节点的节点 add 到另一个组合节点下会先把它从原父节点移除（移动），重复 add 到同一个父节点会抛出 ValueError。
+并行计算：parallel_operation 把互相独立的子树分发到线程池或进程池中计算，节点数不超过 cutoff 的子树
+不再继续拆分；同一父节点下相邻的小子树合并成一个任务，每个任务合计不超过 cutoff 个节点，
+合计不足 min_chunk 个节点的零碎任务留在调用线程中计算，避免为很小的工作付出提交和 pickle 的开销；
+结果按子节点顺序拼接，与顺序计算的结果完全相同。
+使用进程池时子树会被 pickle 发送到子进程，pickle 时不包含 parent 引用，因此只会复制该子树本身。
 """
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import sys
+import time
 
 
 # 抽象组件类
@@ -10,11 +31,76 @@ class Component(ABC):
     def operation(self):
         pass
 
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        old_name, self._name = self._name, name
+        if self.parent is not None:
+            self.parent._rename_child(self, old_name)
+        self.invalidate()
+
+    def get_children(self):
+        return ()
+
+    def iter_preorder(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.get_children()))
+
+    def iter_postorder(self):
+        stack = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                yield node
+                continue
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.get_children()))
+
+    def iter_bfs(self):
+        queue = deque([self])
+        while queue:
+            node = queue.popleft()
+            yield node
+            queue.extend(node.get_children())
+
+    def iter_operation(self):
+        yield self.operation()
+
+    def __getstate__(self):
+        # pickle 子树时不带上 parent，否则会顺着父节点把整棵树都复制过去
+        state = self.__dict__.copy()
+        state["parent"] = None
+        return state
+
+    def invalidate(self):
+        # 祖先节点缓存的键一定是子孙节点缓存的键的子集，因此遇到缓存为空的节点即可停止
+        node = self if isinstance(self, Composite) else self.parent
+        while node is not None and node._cache:
+            node._cache.clear()
+            node = node.parent
+
 
 # 叶子节点类
 class Leaf(Component):
-    def __init__(self, name):
-        self.name = name
+    def __init__(self, name, value=0):
+        self.parent = None
+        self._name = name
+        self._value = value
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        self.invalidate()
 
     def operation(self):
         return f"Leaf {self.name} operation"
@@ -23,35 +109,341 @@ class Leaf(Component):
 # 组合节点类
 class Composite(Component):
     def __init__(self, name):
-        self.name = name
-        self.children = []
+        self.parent = None
+        self._name = name
+        self._children = {}  # id(子节点) -> 子节点，保持插入顺序
+        self._children_by_name = {}  # 名字 -> {id(子节点): 子节点}，同名子节点按加入顺序排列
+        self._cache = {}  # 聚合名称 -> 子树的聚合结果
+
+    @property
+    def children(self):
+        return self._children.values()
 
     def add(self, component):
-        self.children.append(component)
+        # 一个节点只能有一个父节点：已在本节点下时报错，已在其他节点下时先从原父节点移除，保证原父节点的缓存和索引同步更新
+        if component.parent is self:
+            raise ValueError(f"{component.name} 已经是 {self.name} 的子节点")
+        if component.parent is not None:
+            component.parent.remove(component)
+        self._children[id(component)] = component
+        self._children_by_name.setdefault(component.name, {})[id(component)] = component
+        component.parent = self
+        self.invalidate()
 
     def remove(self, component):
-        self.children.remove(component)
+        if self._children.pop(id(component), None) is None:
+            raise ValueError(f"{component.name} 不是 {self.name} 的子节点")
+        self._unindex_child(component, component.name)
+        component.parent = None
+        self.invalidate()
+
+    def _unindex_child(self, component, name):
+        siblings = self._children_by_name[name]
+        del siblings[id(component)]
+        if not siblings:
+            del self._children_by_name[name]
+
+    def _rename_child(self, component, old_name):
+        self._unindex_child(component, old_name)
+        self._children_by_name.setdefault(component.name, {})[id(component)] = component
+
+    def get_child(self, name):
+        siblings = self._children_by_name.get(name)
+        return next(iter(siblings.values())) if siblings else None
+
+    def find(self, path):
+        node = self
+        for name in path.strip("/").split("/"):
+            if not isinstance(node, Composite):
+                return None
+            node = node.get_child(name)
+            if node is None:
+                return None
+        return node
+
+    def get_children(self):
+        return self.children
 
     def operation(self):
-        results = [child.operation() for child in self.children]
-        return f"Composite {self.name} operation: {', '.join(results)}"
+        cached = self._cache.get("operation")
+        if cached is None:
+            cached = self._cache["operation"] = "".join(self.iter_operation())
+        return cached
+
+    def total(self):
+        return self._aggregate("total", lambda node, values: sum(values), lambda leaf: leaf.value)
+
+    def size(self):
+        return self._aggregate("size", lambda node, sizes: 1 + sum(sizes), lambda leaf: 1)
+
+    def parallel_operation(self, executor, cutoff=1000, min_chunk=None):
+        if min_chunk is None:
+            min_chunk = max(1, cutoff // 10)
+        if self.size() <= cutoff:
+            return self.operation()
+        # 第一步：前序遍历需要拆分的大子树，把相邻的小子树分组，够大的分组提交给执行器
+        split_nodes = []
+        plans = {}  # 拆分节点 id -> 按子节点顺序排列的 (被拆分的子节点, None) 或 (分组, Future/None)
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            split_nodes.append(node)
+            plan = plans[id(node)] = []
+            chunk, chunk_size = [], 0
+            for child in node.children:
+                size = child.size() if isinstance(child, Composite) else 1
+                if isinstance(child, Composite) and size > cutoff:
+                    _flush_chunk(plan, chunk, chunk_size, executor, min_chunk)
+                    chunk, chunk_size = [], 0
+                    plan.append((child, None))
+                    stack.append(child)
+                    continue
+                if chunk and chunk_size + size > cutoff:
+                    _flush_chunk(plan, chunk, chunk_size, executor, min_chunk)
+                    chunk, chunk_size = [], 0
+                chunk.append(child)
+                chunk_size += size
+            _flush_chunk(plan, chunk, chunk_size, executor, min_chunk)
+        # 第二步：逆序处理拆分节点，保证子节点的结果先于父节点拼接，顺序与 operation 一致；
+        # 留在本线程的零碎分组在这里计算，与执行器中的任务同时进行
+        results = {}
+        for node in reversed(split_nodes):
+            parts = []
+            for item, future in plans.pop(id(node)):
+                if isinstance(item, list):
+                    parts.extend(future.result() if future is not None else _evaluate_operations(item))
+                else:
+                    parts.append(results.pop(id(item)))
+            results[id(node)] = f"Composite {node.name} operation: {', '.join(parts)}"
+        return results[id(self)]
+
+    def __setstate__(self, state):
+        # 反序列化后对象 id 发生变化，重建以 id 为键的子节点容器和名字索引
+        self.__dict__.update(state)
+        children = list(self._children.values())
+        self._children = {}
+        self._children_by_name = {}
+        for child in children:
+            self._children[id(child)] = child
+            self._children_by_name.setdefault(child.name, {})[id(child)] = child
+            child.parent = self
+
+    def _aggregate(self, key, combine, leaf_result):
+        # 用显式栈做后序遍历，只重新计算缓存失效的组合节点
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        stack = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                node._cache[key] = combine(node, [
+                    child._cache[key] if isinstance(child, Composite) else leaf_result(child)
+                    for child in node.children
+                ])
+                continue
+            stack.append((node, True))
+            stack.extend((child, False) for child in node.children
+                         if isinstance(child, Composite) and key not in child._cache)
+        return self._cache[key]
+
+    def iter_operation(self):
+        # 栈中保存每一层尚未遍历完的子节点迭代器；片段顺序与递归拼接的结果完全一致
+        yield f"Composite {self.name} operation: "
+        stack = [iter(self.children)]
+        started = [False]  # 对应层是否已输出过子节点，用于决定是否输出分隔符
+        while stack:
+            for child in stack[-1]:
+                if started[-1]:
+                    yield ", "
+                else:
+                    started[-1] = True
+                if isinstance(child, Composite):
+                    # 子孙节点不缓存自己的字符串，只放一个 None 占位，使 invalidate 能沿 parent 链继续向上
+                    cached = child._cache.setdefault("operation", None)
+                    if cached is not None:
+                        yield cached
+                        continue
+                    yield f"Composite {child.name} operation: "
+                    stack.append(iter(child.children))
+                    started.append(False)
+                    break
+                yield child.operation()
+            else:
+                stack.pop()
+                started.pop()
+
+
+def _evaluate_operations(components):
+    # 模块级函数，进程池可以 pickle；一个任务计算一组相邻的子树
+    return [component.operation() for component in components]
+
+
+def _flush_chunk(plan, chunk, chunk_size, executor, min_chunk):
+    if not chunk:
+        return
+    future = executor.submit(_evaluate_operations, chunk) if chunk_size >= min_chunk else None
+    plan.append((chunk, future))
+
+
+# 计算代价较高的叶子节点（例如需要 I/O），用于演示并行计算
+class SlowLeaf(Leaf):
+    def operation(self):
+        time.sleep(0.001)
+        return super().operation()
+
+
+def recursive_operation(component):
+    # 改造前的递归实现，用于性能对比
+    if isinstance(component, Composite):
+        results = [recursive_operation(child) for child in component.children]
+        return f"Composite {component.name} operation: {', '.join(results)}"
+    return component.operation()
+
+
+def benchmark_traversal(depth=100_000, width=1_000_000):
+    deep = root = Composite("0")
+    for i in range(1, depth):
+        child = Composite(str(i))
+        deep.add(child)
+        deep = child
+    deep.add(Leaf("bottom"))
+
+    wide = Composite("wide")
+    for i in range(width):
+        wide.add(Leaf(str(i)))
+
+    for name, tree in ((f"{depth} 层深", root), (f"{width} 个子节点", wide)):
+        start = time.perf_counter()
+        try:
+            recursive_operation(tree)
+            before = f"{time.perf_counter() - start:.3f}s"
+        except RecursionError:
+            before = "RecursionError"
+        start = time.perf_counter()
+        size = sum(len(fragment) for fragment in tree.iter_operation())
+        streaming = time.perf_counter() - start
+        start = time.perf_counter()
+        count = sum(1 for _ in tree.iter_preorder())
+        preorder = time.perf_counter() - start
+        print(f"{name}: 递归 operation {before}，流式 iter_operation {streaming:.3f}s（{size} 个字符），"
+              f"前序遍历 {count} 个节点 {preorder:.3f}s")
+
+
+def benchmark_churn(width=100_000):
+    wide = Composite("wide")
+    leaves = [Leaf(str(i)) for i in range(width)]
+    for leaf in leaves:
+        wide.add(leaf)
+    start = time.perf_counter()
+    for i in range(0, width, 100):
+        wide.find(str(i))
+    lookup = time.perf_counter() - start
+    start = time.perf_counter()
+    for leaf in leaves[::2]:
+        wide.remove(leaf)
+    removal = time.perf_counter() - start
+    print(f"{width} 个子节点：按名字查找 {width // 100} 次 {lookup * 1000:.2f}ms，删除 {width // 2} 个子节点 {removal * 1000:.2f}ms")
+
+
+def build_slow_tree(fanout=10, levels=3):
+    root = Composite("root")
+    frontier = [root]
+    for level in range(levels):
+        next_frontier = []
+        for parent in frontier:
+            for i in range(fanout):
+                child = Composite(f"{parent.name}.{i}") if level < levels - 1 else SlowLeaf(f"{parent.name}.{i}")
+                parent.add(child)
+                next_frontier.append(child)
+        frontier = next_frontier
+    return root
+
+
+def benchmark_parallel(cutoff=20):
+    expected = build_slow_tree().operation()
+    start = time.perf_counter()
+    build_slow_tree().operation()
+    sequential = time.perf_counter() - start
+    for name, executor_cls in (("线程池", ThreadPoolExecutor), ("进程池", ProcessPoolExecutor)):
+        tree = build_slow_tree()
+        with executor_cls(max_workers=8) as executor:
+            start = time.perf_counter()
+            result = tree.parallel_operation(executor, cutoff=cutoff)
+            elapsed = time.perf_counter() - start
+        assert result == expected
+        print(f"{tree.size()} 个节点：顺序计算 {sequential:.3f}s，{name}并行 {elapsed:.3f}s（cutoff={cutoff}）")
+
+
+def benchmark_memoization(fanout=10, levels=5):
+    root = Composite("root")
+    frontier = [root]
+    for level in range(levels):
+        next_frontier = []
+        for parent in frontier:
+            for i in range(fanout):
+                child = Composite(f"{parent.name}.{i}") if level < levels - 1 else Leaf(f"{parent.name}.{i}", 1)
+                parent.add(child)
+                next_frontier.append(child)
+        frontier = next_frontier
+    leaf = frontier[-1]
+
+    for name, query in (("total", root.total), ("size", root.size)):
+        start = time.perf_counter()
+        query()
+        first = time.perf_counter() - start
+        leaf.value += 1
+        leaf.name = leaf.name + "'"
+        start = time.perf_counter()
+        query()
+        requery = time.perf_counter() - start
+        print(f"{len(frontier)} 个叶子，{name}: 首次计算 {first * 1000:.2f}ms，修改一个叶子后重新查询 {requery * 1000:.3f}ms")
 
 
 # 客户端代码
 if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        benchmark_traversal()
+        benchmark_memoization()
+        benchmark_churn()
+        benchmark_parallel()
+        sys.exit()
+
     # 创建叶子节点
-    leaf1 = Leaf("Leaf1")
-    leaf2 = Leaf("Leaf2")
+    leaf1 = Leaf("Leaf1", 1)
+    leaf2 = Leaf("Leaf2", 2)
 
     # 创建组合节点
     composite1 = Composite("Composite1")
     composite1.add(leaf1)
     composite1.add(leaf2)
 
-    leaf3 = Leaf("Leaf3")
+    leaf3 = Leaf("Leaf3", 3)
     composite2 = Composite("Composite2")
     composite2.add(leaf3)
     composite2.add(composite1)
 
     # 执行操作
-    print(composite2.operation())
\ No newline at end of file
+    print(composite2.operation())
+
+    # 遍历
+    print("前序:", [node.name for node in composite2.iter_preorder()])
+    print("后序:", [node.name for node in composite2.iter_postorder()])
+    print("广度优先:", [node.name for node in composite2.iter_bfs()])
+
+    # 修改叶子后，只有它的祖先节点需要重新计算
+    print("合计:", composite2.total())
+    leaf1.value = 10
+    leaf1.name = "Leaf1*"
+    print("合计:", composite2.total())
+    print(composite2.operation())
+
+    # 按路径查找并删除节点
+    print(composite2.find("Composite1/Leaf1*").name)
+    composite1.remove(composite2.find("Composite1/Leaf2"))
+    print(composite2.operation())
+
+    # 并行计算耗时的叶子节点，结果与顺序计算一致
+    slow_tree = build_slow_tree(fanout=4, levels=3)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        print(slow_tree.parallel_operation(executor, cutoff=5) == build_slow_tree(fanout=4, levels=3).operation())
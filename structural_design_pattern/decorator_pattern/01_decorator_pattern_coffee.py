@@ -1,10 +1,21 @@
 """
 装饰器模式（Decorator Pattern）是一种结构型设计模式，它允许向一个现有的对象添加新的功能，同时又不改变其结构。这种模式创建了一个装饰类，用来包装原有的类，并在保持类方法签名完整性的前提下，提供了额外的功能。装饰器模式以对客户端透明的方式扩展对象的功能，是继承关系的一个替代方案。通过使用不同的具体装饰器类及这些装饰器类的排列组合，可以创造出很多不同行为的组合。
+扁平化装饰器链：每多一层装饰器，cost() 和 get_description() 就多一层函数调用和一次字符串拼接。
+具体装饰器用 extra_cost/extra_description 声明自己的增量，CompiledCoffee 把整条装饰器链“编译”成
+预先算好的总价和描述，查询耗时与链的深度无关。只有沿用基类 cost/get_description 实现的装饰器才会被扁平化，
+重写了这两个方法的子类被当作基础对象按原样调用。编译时 CompiledCoffee 登记到自己收集的每个装饰器上，
+只有这些装饰器的 coffee 或 extra_* 被修改时才会通知它重新编译，其他装饰器链的变化不会影响它。
+具体组件类用 constant = True 声明价格和描述是常量（只对声明它的类本身生效），此时整条链的结果完全预先算好；
+否则只预先算好增量总和，每次查询调用一次基础对象。
 """
 from abc import ABC, abstractmethod
+import sys
+import time
+import weakref
 
 # 抽象组件类
 class Coffee(ABC):
+    constant = False  # 价格和描述是否为常量
     @abstractmethod
     def get_description(self):
         pass
@@ -15,6 +26,8 @@ class Coffee(ABC):
 
 # 具体组件类
 class SimpleCoffee(Coffee):
+    constant = True
+
     def get_description(self):
         return "Simple Coffee"
 
@@ -23,33 +36,145 @@ class SimpleCoffee(Coffee):
 
 # 抽象装饰器类
 class CoffeeDecorator(Coffee):
+    extra_cost = None  # 具体装饰器声明的价格增量，None 表示无法扁平化
+    extra_description = None
+    _watchers = ()  # 编译了本装饰器的 CompiledCoffee（弱引用），第一次被登记时才创建
+
     def __init__(self, coffee):
         self.coffee = coffee
 
+    @property
+    def coffee(self):
+        return self._coffee
+
+    @coffee.setter
+    def coffee(self, coffee):
+        self._coffee = coffee
+        self._notify_watchers()
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in ("extra_cost", "extra_description"):
+            self._notify_watchers()
+
+    def _notify_watchers(self):
+        for watcher in self._watchers:
+            watcher.invalidate()
+
+    def is_flattenable(self):
+        # 子类重写了 cost/get_description 时，实际结果不再只由声明的增量决定
+        cls = type(self)
+        return (self.extra_cost is not None
+                and cls.cost is CoffeeDecorator.cost
+                and cls.get_description is CoffeeDecorator.get_description)
+
+    # 按声明的增量计算；没有声明增量时直接透传
     def get_description(self):
-        return self.coffee.get_description()
+        if self.extra_description is None:
+            return self.coffee.get_description()
+        return self.coffee.get_description() + ", " + self.extra_description
 
     def cost(self):
-        return self.coffee.cost()
+        if self.extra_cost is None:
+            return self.coffee.cost()
+        return self.coffee.cost() + self.extra_cost
 
 # 具体装饰器类：添加牛奶
 class Milk(CoffeeDecorator):
-    def get_description(self):
-        return self.coffee.get_description() + ", Milk"
-
-    def cost(self):
-        return self.coffee.cost() + 0.5
+    extra_cost = 0.5
+    extra_description = "Milk"
 
 # 具体装饰器类：添加糖
 class Sugar(CoffeeDecorator):
+    extra_cost = 0.2
+    extra_description = "Sugar"
+
+# 扁平化的装饰器链
+class CompiledCoffee(Coffee):
+    def __init__(self, coffee):
+        self._decorators = []
+        self.coffee = coffee
+
+    @property
+    def coffee(self):
+        return self._coffee
+
+    @coffee.setter
+    def coffee(self, coffee):
+        self._coffee = coffee
+        self.invalidate()
+
+    def invalidate(self):
+        self._compiled = False
+
+    def _compile(self):
+        for decorator in self._decorators:
+            decorator._watchers.discard(self)
+        # 从外向内收集能扁平化的装饰器，遇到不能扁平化的装饰器或具体组件时停止，把它当作基础对象
+        decorators = []
+        base = self.coffee
+        while isinstance(base, CoffeeDecorator) and base.is_flattenable():
+            if not base._watchers:
+                base._watchers = weakref.WeakSet()
+            base._watchers.add(self)
+            decorators.append(base)
+            base = base.coffee
+        decorators.reverse()
+        self._decorators = decorators
+        self._base = base
+        self._suffix = "".join(f", {decorator.extra_description}" for decorator in decorators)
+        # constant 只看基础对象的类自己是否声明，子类重写了价格时不会误用父类的声明
+        self._base_is_static = type(base).__dict__.get("constant", False)
+        if self._base_is_static:
+            # 按从内到外的顺序累加，与逐层调用 cost() 的浮点结果完全一致
+            cost = base.cost()
+            for decorator in decorators:
+                cost += decorator.extra_cost
+            self._cost = cost
+            self._description = base.get_description() + self._suffix
+        else:
+            # 基础对象的价格可能变化，只预先算好增量总和（与逐层累加相比可能有最后一位的浮点舍入差异）
+            self._extra_cost = sum(decorator.extra_cost for decorator in decorators)
+        self._compiled = True
+
     def get_description(self):
-        return self.coffee.get_description() + ", Sugar"
+        if not self._compiled:
+            self._compile()
+        if self._base_is_static:
+            return self._description
+        return self._base.get_description() + self._suffix
 
     def cost(self):
-        return self.coffee.cost() + 0.2
+        if not self._compiled:
+            self._compile()
+        if self._base_is_static:
+            return self._cost
+        return self._base.cost() + self._extra_cost
+
+
+def benchmark_chain(depths=(1, 10, 50, 200), queries=20_000):
+    for depth in depths:
+        coffee = SimpleCoffee()
+        for i in range(depth):
+            coffee = Milk(coffee) if i % 2 == 0 else Sugar(coffee)
+        compiled = CompiledCoffee(coffee)
+        assert (compiled.cost(), compiled.get_description()) == (coffee.cost(), coffee.get_description())
+        timings = []
+        for target in (coffee, compiled):
+            start = time.perf_counter()
+            for _ in range(queries):
+                target.cost()
+                target.get_description()
+            timings.append((time.perf_counter() - start) / queries * 1e6)
+        print(f"装饰器链深度 {depth}: 逐层调用 {timings[0]:.2f}us/次，扁平化 {timings[1]:.2f}us/次")
+
 
 # 客户端代码
 if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        benchmark_chain()
+        sys.exit()
+
     coffee = SimpleCoffee()
     print(f"{coffee.get_description()}: ${coffee.cost()}")
 
@@ -57,4 +182,8 @@ if __name__ == "__main__":
     print(f"{coffee_with_milk.get_description()}: ${coffee_with_milk.cost()}")
 
     coffee_with_milk_and_sugar = Sugar(coffee_with_milk)
-    print(f"{coffee_with_milk_and_sugar.get_description()}: ${coffee_with_milk_and_sugar.cost()}")
\ No newline at end of file
+    print(f"{coffee_with_milk_and_sugar.get_description()}: ${coffee_with_milk_and_sugar.cost()}")
+
+    # 编译装饰器链，查询时不再逐层调用
+    compiled = CompiledCoffee(Milk(coffee_with_milk_and_sugar))
+    print(f"{compiled.get_description()}: ${compiled.cost()}")
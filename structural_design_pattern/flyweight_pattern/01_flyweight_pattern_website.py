@@ -2,7 +2,16 @@
 享元模式（Flyweight Pattern）是一种结构型设计模式，它通过共享对象来减少内存使用和提高性能。该模式旨在通过复用现有的对象，而不是每次需要时都创建新对象，从而减少系统中对象的数量。享元模式将对象的状态分为内部状态和外部状态：
 内部状态：存储在享元对象内部，并且不会随环境改变而改变的状态，它可以被多个享元对象共享。
 外部状态：随环境改变而改变，不能被共享的状态，它通常由客户端在使用享元对象时传入。
+通用享元工厂 FlyweightFactory 支持两种保留策略：
+lru：强引用 + 最大容量，超出容量时淘汰最久未使用的享元；
+weak：弱引用（WeakValueDictionary），没有客户端再使用的享元会被垃圾回收。
+工厂是线程安全的，并发获取同一个 key 时只会构造一次享元，同时统计命中、未命中和淘汰次数。
+构造失败时也会清理该 key 的锁；弱引用享元被回收的通知可能在任意代码中（包括持有工厂锁时）触发，
+因此回调里不加锁，只把通知放进队列，下次获取或统计时再在锁内计入淘汰次数。
 """
+from collections import OrderedDict, deque
+import threading
+import weakref
 
 
 # 享元类
@@ -14,15 +23,87 @@ class Website:
         print(f"User {user} is using a {self.site_type} website.")
 
 
+# 通用享元工厂类
+class FlyweightFactory:
+    def __init__(self, creator, policy="lru", max_size=1024):
+        if policy not in ("lru", "weak"):
+            raise ValueError(f"不支持的保留策略: {policy}")
+        self.creator = creator
+        self.policy = policy
+        self.max_size = max_size
+        self.flyweights = OrderedDict() if policy == "lru" else weakref.WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}  # 正在创建中的 key -> 锁，保证同一个 key 只构造一次
+        self._collected = deque()  # 已被回收但尚未计入 evictions 的弱引用享元，deque.append 是原子操作
+
+    def get(self, key):
+        with self._lock:
+            self._count_collected()
+            flyweight = self._lookup(key)
+            if flyweight is not None:
+                self.hits += 1
+                return flyweight
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # 构造可能较慢，只锁住当前 key，不影响其他 key 的获取
+        with key_lock:
+            try:
+                with self._lock:
+                    flyweight = self._lookup(key)
+                    if flyweight is not None:
+                        self.hits += 1
+                        return flyweight
+                    self.misses += 1
+                flyweight = self.creator(key)
+                with self._lock:
+                    self._store(key, flyweight)
+            finally:
+                # 无论构造成功还是抛出异常都要移除 key 锁；只移除自己这一把，避免误删之后新建的锁
+                with self._lock:
+                    if self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+        return flyweight
+
+    def _lookup(self, key):
+        flyweight = self.flyweights.get(key)
+        if flyweight is not None and self.policy == "lru":
+            self.flyweights.move_to_end(key)
+        return flyweight
+
+    def _store(self, key, flyweight):
+        self.flyweights[key] = flyweight
+        if self.policy == "weak":
+            weakref.finalize(flyweight, self._on_collected)
+        elif len(self.flyweights) > self.max_size:
+            self.flyweights.popitem(last=False)
+            self.evictions += 1
+
+    def _on_collected(self):
+        # 由垃圾回收触发，当前线程可能正持有 self._lock（不可重入），因此这里不能加锁
+        self._collected.append(None)
+
+    def _count_collected(self):
+        # 调用方持有 self._lock
+        while self._collected:
+            self._collected.popleft()
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            self._count_collected()
+            return {"size": len(self.flyweights), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
+
+
 # 享元工厂类
-class WebsiteFactory:
-    def __init__(self):
-        self.websites = {}
+class WebsiteFactory(FlyweightFactory):
+    def __init__(self, policy="lru", max_size=1024):
+        super().__init__(Website, policy, max_size)
 
     def get_website(self, site_type):
-        if site_type not in self.websites:
-            self.websites[site_type] = Website(site_type)
-        return self.websites[site_type]
+        return self.get(site_type)
 
 
 # 客户端代码
@@ -37,3 +118,17 @@ if __name__ == "__main__":
 
     blog_site = factory.get_website("blog")
     blog_site.use("Charlie")
+    print(news_site1 is news_site2, factory.stats())
+
+    # 高基数 key：LRU 策略只保留最近使用的 100 个享元
+    lru_factory = WebsiteFactory(policy="lru", max_size=100)
+    for i in range(1000):
+        lru_factory.get_website(f"site-{i % 50 if i % 4 else i}")  # 大部分访问集中在热门站点
+    print("lru", lru_factory.stats())
+
+    # 弱引用策略：客户端不再持有的享元会被回收
+    weak_factory = WebsiteFactory(policy="weak")
+    in_use = [weak_factory.get_website(f"site-{i}") for i in range(10)]
+    for i in range(1000):
+        weak_factory.get_website(f"temp-{i}")
+    print("weak", weak_factory.stats())
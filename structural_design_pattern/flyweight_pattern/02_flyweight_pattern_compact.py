@@ -0,0 +1,123 @@
+"""
+紧凑的享元表示
+当系统中存在数百万个享元风格的小对象时，每个实例自带的 __dict__ 会成为内存的主要开销。
+本示例从三个方面压缩内存：
+__slots__：享元基类 CompactFlyweight 及其子类声明 __slots__，实例不再创建 __dict__；
+基类保留 __weakref__ 槽位，因此紧凑享元同样可以交给 FlyweightFactory 的 weak 策略管理；
+字符串驻留：内部状态中的字符串通过 sys.intern 驻留，相同取值的字符串在进程内只保存一份；
+列式外部状态：ExtrinsicStore 把大量客户端的外部状态按列存放在 array 中，每行只记录享元编码和用户编码，
+而不是为每个客户端创建一个 (享元, 用户) 元组。享元编码表由 ExtrinsicStore 自己维护，只引用存储中实际用到的享元，
+不会让所有创建过的享元永远无法释放。
+"""
+from array import array
+import sys
+import tracemalloc
+
+
+# 紧凑享元基类
+class CompactFlyweight:
+    __slots__ = ("__weakref__",)  # 支持弱引用，供 WeakValueDictionary 等弱引用缓存使用
+
+    def __init__(self, **intrinsic_state):
+        for name, value in intrinsic_state.items():
+            setattr(self, name, sys.intern(value) if isinstance(value, str) else value)
+
+
+# 享元类（对照组）
+class Website:
+    def __init__(self, site_type):
+        self.site_type = site_type
+
+    def use(self, user):
+        print(f"User {user} is using a {self.site_type} website.")
+
+
+# 紧凑享元类
+class CompactWebsite(CompactFlyweight):
+    __slots__ = ("site_type",)
+
+    def __init__(self, site_type):
+        super().__init__(site_type=site_type)
+
+    def use(self, user):
+        print(f"User {user} is using a {self.site_type} website.")
+
+
+# 列式外部状态存储
+class ExtrinsicStore:
+    def __init__(self):
+        self.flyweight_codes = array("I")
+        self.user_codes = array("I")
+        self._flyweights = []  # 享元编码 -> 享元对象
+        self._flyweight_codes = {}  # id(享元) -> 享元编码，_flyweights 持有引用，id 不会被复用
+        self._users = []  # 用户编码 -> 用户名
+        self._user_codes = {}  # 用户名 -> 用户编码
+
+    def add(self, flyweight, user):
+        flyweight_code = self._flyweight_codes.get(id(flyweight))
+        if flyweight_code is None:
+            flyweight_code = self._flyweight_codes[id(flyweight)] = len(self._flyweights)
+            self._flyweights.append(flyweight)
+        code = self._user_codes.get(user)
+        if code is None:
+            code = self._user_codes[user] = len(self._users)
+            self._users.append(user)
+        self.flyweight_codes.append(flyweight_code)
+        self.user_codes.append(code)
+
+    def __len__(self):
+        return len(self.flyweight_codes)
+
+    def __iter__(self):
+        flyweights, users = self._flyweights, self._users
+        for flyweight_code, code in zip(self.flyweight_codes, self.user_codes):
+            yield flyweights[flyweight_code], users[code]
+
+    def users_of(self, flyweight):
+        flyweight_code = self._flyweight_codes.get(id(flyweight))
+        users = self._users
+        return [users[code] for fcode, code in zip(self.flyweight_codes, self.user_codes) if fcode == flyweight_code]
+
+
+def measure(build):
+    tracemalloc.start()
+    objects = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, objects
+
+
+def benchmark_memory(n=1_000_000):
+    site_types = ["news", "blog", "shop", "video"]
+
+    # "".join 每次都会生成新的字符串对象，模拟从网络或文件中解析出来的内部状态
+    before, _ = measure(lambda: [Website("".join(site_types[i % 4])) for i in range(n)])
+    after, _ = measure(lambda: [CompactWebsite("".join(site_types[i % 4])) for i in range(n)])
+    print(f"{n} 个享元对象：普通类 {before / n:.1f} 字节/个，__slots__+字符串驻留 {after / n:.1f} 字节/个")
+
+    flyweights = [CompactWebsite(site_type) for site_type in site_types]
+    users = [f"user{i}" for i in range(1000)]
+    before, _ = measure(lambda: [(flyweights[i % 4], "".join(users[i % 1000])) for i in range(n)])
+
+    def build_store():
+        store = ExtrinsicStore()
+        for i in range(n):
+            store.add(flyweights[i % 4], "".join(users[i % 1000]))
+        return store
+
+    after, _ = measure(build_store)
+    print(f"{n} 条外部状态：(享元, 用户) 元组 {before / n:.1f} 字节/条，列式存储 {after / n:.1f} 字节/条")
+
+
+if __name__ == "__main__":
+    news = CompactWebsite("news")
+    blog = CompactWebsite("blog")
+    store = ExtrinsicStore()
+    store.add(news, "Alice")
+    store.add(news, "Bob")
+    store.add(blog, "Charlie")
+    for flyweight, user in store:
+        flyweight.use(user)
+    print(store.users_of(news))
+
+    benchmark_memory()
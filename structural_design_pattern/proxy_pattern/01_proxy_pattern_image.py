@@ -1,6 +1,22 @@
 """
 代理模式（Proxy Pattern）是一种结构型设计模式，它允许你通过创建一个代理对象来控制对另一个对象（即真实对象）的访问。代理对象充当了真实对象的接口，客户端与代理对象交互，而不是直接与真实对象交互。代理模式可以在不改变真实对象的情况下，对其功能进行增强或控制，比如进行访问控制、延迟加载、日志记录等。
+缓存代理：ProxyImage 只把真实图片缓存在自己身上，两个代理指向同一个文件时会各自加载一次。
+CachingProxyImage 使用进程级共享的 ImageCache：按文件名做 LRU 缓存并限制总字节数，
+多个线程同时请求同一个文件时只会加载一次，其余线程等待同一次加载的结果；
+prefetch 把一批图片提交给缓存常驻的线程池后立即返回各文件的 Future，在首次显示之前于后台预先加载；
+单个文件加载失败不影响其他文件，失败原因按文件名记录在 prefetch_errors 中。
+内存映射：RealImage 通过 mmap 加载文件并以 memoryview 暴露数据，只有被访问到的区域才会读入内存，
+多个代理和使用者共享同一份页面；read(offset, length) 返回零拷贝的切片。
 """
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+import mmap
+import os
+import sys
+import tempfile
+import threading
+import time
 
 
 # 抽象主题类
@@ -8,6 +24,9 @@ class Image:
     def display(self):
         pass
 
+    def read(self, offset=0, length=None):
+        pass
+
 
 # 真实主题类
 class RealImage(Image):
@@ -17,10 +36,33 @@ class RealImage(Image):
 
     def load_from_disk(self):
         print(f"Loading {self.filename}")
+        self._mmap = None
+        # 文件不存在时 open 直接抛出 FileNotFoundError；大小取自已打开的文件，避免先检查再打开的竞态
+        with open(self.filename, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            if self.size == 0:
+                self.data = memoryview(b"")  # 空文件无法建立映射
+                return
+            # 映射建立后即可关闭文件，映射本身保持有效
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self._mmap)
 
     def display(self):
         print(f"Displaying {self.filename}")
 
+    def read(self, offset=0, length=None):
+        end = self.size if length is None else offset + length
+        return self.data[offset:end]  # memoryview 切片，不复制数据
+
+    def close(self):
+        # 仍有切片在使用时 mmap 无法关闭，此时交给垃圾回收处理
+        self.data.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+
 
 # 代理类
 class ProxyImage(Image):
@@ -29,13 +71,169 @@ class ProxyImage(Image):
         self.real_image = None
 
     def display(self):
+        self._get_real_image().display()
+
+    def read(self, offset=0, length=None):
+        return self._get_real_image().read(offset, length)
+
+    def _get_real_image(self):
         if self.real_image is None:
             self.real_image = RealImage(self.filename)
-        self.real_image.display()
+        return self.real_image
+
+
+# 进程级共享的图片缓存
+class ImageCache:
+    def __init__(self, max_bytes=256 * 1024 * 1024, loader=RealImage, prefetch_workers=4):
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.prefetch_workers = prefetch_workers
+        self.current_bytes = 0
+        self.prefetch_errors = {}  # 文件名 -> 最近一次预加载失败的异常
+        self._executor = None  # 预加载线程池，第一次预加载时创建，之后一直复用
+        self._images = OrderedDict()  # 文件名 -> 真实图片，按最近使用排序
+        self._loading = {}  # 文件名 -> 正在进行的加载（Future）
+        self._lock = threading.Lock()
+
+    def get(self, filename):
+        with self._lock:
+            image = self._images.get(filename)
+            if image is not None:
+                self._images.move_to_end(filename)
+                return image
+            future = self._loading.get(filename)
+            owner = future is None
+            if owner:
+                future = self._loading[filename] = Future()
+        if not owner:
+            return future.result()  # 其他线程正在加载同一个文件，等待它的结果
+        try:
+            image = self.loader(filename)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[filename]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[filename]
+            self._store(filename, image)
+        future.set_result(image)
+        return image
+
+    def _store(self, filename, image):
+        size = getattr(image, "size", 0)
+        if size > self.max_bytes:
+            return  # 超过整个缓存预算的图片不缓存
+        self._images[filename] = image
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._images.popitem(last=False)
+            self.current_bytes -= getattr(evicted, "size", 0)
+
+    def prefetch(self, filenames):
+        # 只提交不等待，返回 {文件名: Future}；需要结果的调用方可以自行等待
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.prefetch_workers,
+                                                    thread_name_prefix="image-prefetch")
+            executor = self._executor
+        futures = {}
+        for filename in filenames:
+            future = executor.submit(self.get, filename)
+            future.add_done_callback(partial(self._record_prefetch, filename))
+            futures[filename] = future
+        return futures
+
+    def _record_prefetch(self, filename, future):
+        error = future.exception()
+        with self._lock:
+            if error is None:
+                self.prefetch_errors.pop(filename, None)
+            else:
+                self.prefetch_errors[filename] = error
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+image_cache = ImageCache()
+
+
+def prefetch(filenames):
+    return image_cache.prefetch(filenames)
+
+
+# 缓存代理类
+class CachingProxyImage(Image):
+    def __init__(self, filename, cache=None):
+        self.filename = filename
+        self.cache = cache or image_cache
+
+    def display(self):
+        # 每次都从共享缓存获取，代理本身不持有真实图片，缓存的字节预算才能生效
+        self.cache.get(self.filename).display()
+
+    def read(self, offset=0, length=None):
+        return self.cache.get(self.filename).read(offset, length)
+
+
+def current_rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # 峰值 RSS（macOS 上单位为字节）
+
+
+def benchmark_load(size_mb=512, touched_regions=16, region_size=64 * 1024):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "large_asset.bin")
+        with open(path, "wb") as f:
+            chunk = os.urandom(1024 * 1024)
+            for _ in range(size_mb):
+                f.write(chunk)
+        step = size_mb * 1024 * 1024 // touched_regions
+
+        rss = current_rss()
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            data = f.read()
+        checksum = sum(data[i * step] for i in range(touched_regions))
+        elapsed = time.perf_counter() - start
+        print(f"read()：加载 {elapsed * 1000:.1f}ms，RSS 增加 {(current_rss() - rss) / 2 ** 20:.1f}MB")
+        del data
+
+        rss = current_rss()
+        start = time.perf_counter()
+        image = RealImage(path)
+        regions = [image.read(i * step, region_size) for i in range(touched_regions)]
+        assert checksum == sum(region[0] for region in regions)
+        elapsed = time.perf_counter() - start
+        print(f"mmap：加载 {elapsed * 1000:.1f}ms，RSS 增加 {(current_rss() - rss) / 2 ** 20:.1f}MB"
+              f"（访问了 {touched_regions} 个 {region_size // 1024}KB 区域）")
+        for region in regions:
+            region.release()
+        image.close()
 
 
 # 客户端代码
 if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        benchmark_load()
+        sys.exit()
+
+    # 在临时目录中准备示例图片文件
+    source_file = os.path.abspath(__file__)
+    demo_dir = tempfile.TemporaryDirectory()
+    os.chdir(demo_dir.name)
+    for name in ["test.jpg", "photo.png"] + [f"gallery_{i}.jpg" for i in range(3)]:
+        with open(name, "wb") as f:
+            f.write(os.urandom(1024))
+
     image = ProxyImage("test.jpg")
 
     # 第一次调用，会加载图片
@@ -43,3 +241,30 @@ if __name__ == "__main__":
 
     # 第二次调用，不会再次加载图片
     image.display()
+
+    # 两个缓存代理指向同一个文件，只会加载一次
+    CachingProxyImage("test.jpg").display()
+    CachingProxyImage("test.jpg").display()
+
+    # 多个线程同时显示同一张图片，也只会加载一次
+    threads = [threading.Thread(target=CachingProxyImage("photo.png").display) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 首次显示前在后台预先加载一批图片，其中一个文件不存在，不影响其他文件
+    futures = prefetch([f"gallery_{i}.jpg" for i in range(3)] + ["gallery_missing.jpg"])
+    CachingProxyImage("gallery_0.jpg").display()  # 正在预加载时会等待同一次加载，不会重复加载
+    wait(futures.values())
+    print("预加载失败:", {name: type(error).__name__ for name, error in image_cache.prefetch_errors.items()})
+
+    # 通过代理读取文件片段，返回的是共享内存页的零拷贝切片
+    header = CachingProxyImage(source_file).read(0, 3)
+    print(bytes(header))
+
+    # 文件不存在时直接报错，而不是当作空图片
+    try:
+        ProxyImage("missing.jpg").display()
+    except FileNotFoundError as e:
+        print(f"加载失败: {e}")
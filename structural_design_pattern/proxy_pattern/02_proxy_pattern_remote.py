@@ -0,0 +1,148 @@
+"""
+远程代理（异步版本）
+01 示例中的 ProxyImage 在第一次 display() 时同步阻塞地加载真实图片，而实际项目中真实对象往往位于较慢的远程服务之后。
+本示例用 asyncio 实现 Image 接口的远程代理：
+可插拔加载器：真实对象由 loader.load(key) 异步获取，示例中用 FakeRemoteLoader 模拟远程服务；
+请求合并：多个协程同时请求同一个 key 时只发起一次远程请求，共享同一个结果；
+超时：每次调用可以单独指定超时，超时不会取消其他调用方共享的那次请求；
+stale-while-revalidate：缓存过期后的 max_stale 秒内先返回旧数据，同时在后台刷新；超过这个时间的旧数据不再返回，
+只能等待新的请求，请求超时则抛出 asyncio.TimeoutError；
+延迟直方图：记录每次远程请求的耗时分布。
+"""
+import asyncio
+import bisect
+import time
+
+
+# 抽象主题类
+class AsyncImage:
+    async def display(self):
+        pass
+
+
+# 真实主题类
+class RemoteImage(AsyncImage):
+    def __init__(self, key, data):
+        self.key = key
+        self.data = data
+
+    async def display(self):
+        print(f"Displaying {self.key} ({len(self.data)} bytes)")
+
+
+# 加载器接口
+class ImageLoader:
+    async def load(self, key):
+        raise NotImplementedError
+
+
+# 模拟的远程服务
+class FakeRemoteLoader(ImageLoader):
+    def __init__(self, latency=0.1):
+        self.latency = latency
+        self.calls = 0
+
+    async def load(self, key):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return f"<image {key} v{self.calls}>".encode()
+
+
+class LatencyHistogram:
+    def __init__(self, bounds_ms=(5, 10, 25, 50, 100, 250, 500, 1000)):
+        self.bounds_ms = list(bounds_ms)
+        self.counts = [0] * (len(self.bounds_ms) + 1)  # 最后一个桶记录超过最大边界的请求
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds_ms, seconds * 1000)] += 1
+
+    def __repr__(self):
+        labels = [f"<={bound}ms" for bound in self.bounds_ms] + [f">{self.bounds_ms[-1]}ms"]
+        return ", ".join(f"{label}: {count}" for label, count in zip(labels, self.counts) if count)
+
+
+class RemoteImageFetcher:
+    def __init__(self, loader, ttl=30.0, max_stale=300.0, timeout=1.0):
+        self.loader = loader
+        self.ttl = ttl  # 单位：秒，缓存在这段时间内视为新鲜
+        self.max_stale = max_stale  # 单位：秒，过期后仍可作为旧数据返回的时间
+        self.timeout = timeout
+        self.histogram = LatencyHistogram()
+        self._cache = {}  # key -> (RemoteImage, 获取时间)
+        self._inflight = {}  # key -> 正在进行的远程请求（Task）
+
+    async def get(self, key, timeout=None):
+        entry = self._cache.get(key)
+        if entry is not None:
+            image, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                return image
+            if age < self.ttl + self.max_stale:
+                self._fetch(key)  # 后台刷新，本次直接返回旧数据
+                return image
+        # 走到这里说明没有缓存，或缓存已超过 max_stale，不能再作为旧数据返回
+        if timeout is None:
+            timeout = self.timeout
+        return await asyncio.wait_for(asyncio.shield(self._fetch(key)), timeout)
+
+    def _fetch(self, key):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key))
+            # 后台刷新失败时没有调用方等待结果，这里取出异常，避免 asyncio 报告未处理的异常
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return task
+
+    async def _load(self, key):
+        start = time.perf_counter()
+        try:
+            data = await self.loader.load(key)
+            image = RemoteImage(key, data)
+            self._cache[key] = (image, time.monotonic())
+            return image
+        finally:
+            self.histogram.record(time.perf_counter() - start)
+            del self._inflight[key]
+
+
+# 远程代理类
+class AsyncProxyImage(AsyncImage):
+    def __init__(self, key, fetcher, timeout=None):
+        self.key = key
+        self.fetcher = fetcher
+        self.timeout = timeout
+
+    async def display(self):
+        image = await self.fetcher.get(self.key, self.timeout)
+        await image.display()
+
+
+# 客户端代码
+async def main():
+    loader = FakeRemoteLoader(latency=0.2)
+    fetcher = RemoteImageFetcher(loader, ttl=0.5, max_stale=10.0)
+
+    # 50 个代理同时显示同一张图片，只发起一次远程请求
+    await asyncio.gather(*(AsyncProxyImage("banner.jpg", fetcher).display() for _ in range(50)))
+    print(f"远程请求次数: {loader.calls}")
+
+    # 超时较短的调用方放弃等待，但不会取消其他调用方共享的请求
+    try:
+        await AsyncProxyImage("avatar.jpg", fetcher, timeout=0.05).display()
+    except asyncio.TimeoutError:
+        print("avatar.jpg 请求超时")
+    await AsyncProxyImage("avatar.jpg", fetcher).display()
+    print(f"远程请求次数: {loader.calls}")
+
+    # 缓存过期后先返回旧数据，同时在后台刷新
+    await asyncio.sleep(0.6)
+    await AsyncProxyImage("banner.jpg", fetcher).display()
+    await asyncio.sleep(0.3)
+    await AsyncProxyImage("banner.jpg", fetcher).display()
+    print(f"远程请求耗时分布: {fetcher.histogram}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())